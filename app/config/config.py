@@ -4,7 +4,89 @@ class Settings(BaseSettings):
     redis_host: str
     redis_port: int
     redis_db: int = 0
-    cache_ttl: int = 60
+    redis_max_connections: int = 100 # per worker, beyond this commands fail fast instead of queueing
+    redis_socket_timeout: float = 0.5 # in seconds
+    redis_socket_connect_timeout: float = 0.5 # in seconds
+    redis_health_check_interval: int = 30 # in seconds, idle connections are PINGed before reuse after this
+    redis_operation_budget_ms: int = 50 # latency budget of a cache / rate limiter call on the request path
+    redis_operation_budget_per_command_ms: float = 0.5 # added for every further command (or key) of a batch call
+    redis_degraded_cooldown: float = 5.0 # in seconds, Redis is skipped for this long after a failed call
+    degraded_cache_max_size: int = 10_000 # in-process copy of the cache, served while Redis is unavailable
+    degraded_rate_limit_share: float = 0.25 # share of a vendor's rate limit a worker may use on its own while degraded
+    cache_ttl: int = 60 # hard TTL, in seconds
+    cache_soft_ttl: int = 45 # in seconds, served stale & refreshed in the background between soft and hard TTL
+
+    # optional in-process L1 cache in front of Redis, kept coherent across workers via pub/sub
+    l1_cache_enabled: bool = False
+    l1_cache_max_size: int = 10_000 # entries per worker
+    l1_cache_ttl: int = 5 # in seconds, capped at cache_ttl
+
+    # compact cache layout: skus bucketed into small hashes with per-field TTLs (needs Redis >= 7.4), much less
+    # memory per sku; keep skus / buckets under Redis' hash-max-listpack-entries (128 by default), about skus / 100
+    # leaves room for the uneven spread of crc32: 131_072 buckets hold ~76 skus each at 10M skus (~8 at 1M)
+    compact_cache_enabled: bool = False
+    compact_cache_buckets: int = 131_072
+
+    # push the best vendor changes to subscribers (GET /subscriptions, server-sent events) instead of being polled
+    change_notifications_enabled: bool = False
+    subscription_heartbeat_interval: float = 15.0 # in seconds, keeps idle connections open through proxies
+    subscription_queue_size: int = 100 # pending events per connection, the oldest are dropped beyond this
+
+    # negative cache tier, shorter lived than positive entries
+    negative_cache_ttl_out_of_stock: int = 15 # in seconds
+    negative_cache_ttl_unknown_sku: int = 30 # in seconds, no vendor knows the sku (404 from all of them)
+
+    # optional Bloom filter of unknown skus, rejected by the router without any Redis or vendor call
+    unknown_sku_filter_enabled: bool = False
+    unknown_sku_filter_capacity: int = 1_000_000 # expected number of unknown skus
+    unknown_sku_filter_error_rate: float = 0.0001 # false positives reject valid skus, keep it low
+    unknown_sku_filter_rotation: int = 30 # in seconds, the filter starts over this often, like the negative tier expires
+    unknown_sku_filter_sync_interval: float = 5.0 # in seconds, how often the in-memory mirror is refreshed
+
+    # attach the trace id of the request (W3C traceparent header) to the HTTP metrics as an exemplar,
+    # only exposed in the OpenMetrics format and not supported in multiprocess mode
+    metrics_exemplars_enabled: bool = False
+
+    # optional OpenTelemetry tracing of the request phases (needs opentelemetry-sdk and opentelemetry-exporter-otlp)
+    tracing_enabled: bool = False
+    tracing_service_name: str = "px-assignment"
+    tracing_otlp_endpoint: str = "http://localhost:4317"
+
+    # top-K of the requested skus (Space-Saving sketch, fixed memory), see GET /admin/hot-skus
+    hot_sku_tracking_enabled: bool = True
+    hot_sku_capacity: int = 1_000 # skus counted per worker, the top-K is read out of these
+    hot_sku_top_k: int = 50 # reported in the metrics and pre-warmed
+    hot_sku_maintenance_interval: float = 5.0 # in seconds, how often the metrics are published (and the top-K pre-warmed)
+    # refresh the top-K skus before their cache entries expire, so the most popular ones never see a cold miss
+    hot_sku_prewarm_enabled: bool = False
+    hot_sku_prewarm_margin: float = 10.0 # in seconds, refresh once the entry has less than this left to live
+
+    # catalog warm-up at startup (see app/services/warmup.py), from a file and/or a Redis set of skus
+    warmup_on_startup: bool = False
+    warmup_sku_file: str | None = None
+    warmup_redis_set: str | None = None
+    warmup_rate_limit_share: float = 0.5 # share of the vendors' rate limits it may use, live traffic keeps the rest
+    warmup_chunk_size: int = 100 # skus per cache lookup / pipelined write
+    warmup_lock_ttl: int = 3_600 # in seconds, the lock that keeps it to one worker expires even if that worker dies
+
+    # per-vendor offer cache, an offer never outlives the vendor's own freshness (Constants.FRESHNESS_LIMIT)
+    offer_cache_ttl: int = 300 # in seconds, upper bound
+
+    # pooled per-vendor http clients (created once in app_lifespan)
+    vendor_http_max_connections: int = 100 # per vendor
+    vendor_http_max_keepalive_connections: int = 20 # per vendor
+    vendor_http_keepalive_expiry: float = 30.0 # in seconds
+    vendor_http2_enabled: bool = False # needs the "h2" package, installed via httpx[http2]
+
+    # end-to-end latency budget per request, in millis (overridable per request via X-Request-Deadline-Ms)
+    request_deadline_ms: int = 3_000
+    max_request_deadline_ms: int = 10_000
+    partial_result_cache_ttl: int = 10 # in seconds, decisions made on partial data are cached briefly
+
+    # per-vendor request timeouts, in seconds
+    vendora_api_timeout: float = 2.0
+    vendorb_api_timeout: float = 2.0
+    vendorc_api_timeout: float = 2.0
 
     model_config = SettingsConfigDict(env_file=".env.example")
 
@@ -10,11 +10,14 @@ class Constants:
     VENDORC_ENDPOINT = "https://mocki.io/v1/e7517f58-f058-4208-bad7-9754ddf6e84x"
 
     BEST_VENDOR_SELECTION_OOS_MESSAGE = "OUT_OF_STOCK"
+    BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE = "UNKNOWN_SKU" # no vendor knows the sku, surfaced as a 404
 
-    # move to .env ??
-    VENDOR_API_TIMEOUT = 2.0 # in seconds
-    VENDOR_API_RETRIES = 2
-    DELAY_BETWEEN_RETRIES = 1 # in seconds, skipping exponential-backoff for now to keep things simple. modifications are minimal if it's needed
+    # sku validation rules, shared by the single and the batch endpoints
+    SKU_MIN_LENGTH = 3
+    SKU_MAX_LENGTH = 20
+    SKU_PATTERN = r"^[a-zA-Z0-9]+$"
+
+    # retries (count, backoff, budget) are configured in switch.RetryParams
 
     # data freshness limit, beyond which it is to be discarded
     FRESHNESS_LIMIT = 600 # in seconds
\ No newline at end of file
@@ -2,10 +2,16 @@
 from fastapi import Request
 from redis.asyncio import Redis
 
+from app.external_clients.http_clients import VendorHTTPClients
+
 # This function is the only place in the entire app that touches request.app.state.redis
 async def get_redis(request: Request) -> Redis:
     return request.app.state.redis
 
+# same for the pooled vendor http clients, only this function touches request.app.state.vendor_http_clients
+async def get_vendor_http_clients(request: Request) -> VendorHTTPClients:
+    return request.app.state.vendor_http_clients
+
 # This ensures:
 # - Service layer does not depend on FastAPI (keeps the service layer clean, pure, and testable)
 # - The complete Request is not passed around (service functions receive only Redis, not the entire Request structure)
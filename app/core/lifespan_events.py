@@ -1,31 +1,78 @@
 
+from asyncio import Task, create_task, gather
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from redis.asyncio import Redis
 
 from app.config.config import settings
+from app.instrumentation.tracing import configure_tracing, shutdown_tracing
+from app.external_clients.http_clients import VendorHTTPClients, build_vendor_http_clients, close_vendor_http_clients
+from app.services.cache_service import run_l1_invalidation_listener
+from app.services.change_feed import run_change_listener
+from app.services.sku_filter import run_unknown_sku_filter_sync
+from app.routers.sku import sku_service
+from app.services.warmup import run_startup_warmup
 
 redis_client: Redis | None = None
+vendor_http_clients: VendorHTTPClients | None = None
 
-@asynccontextmanager
-async def app_lifespan(app: FastAPI):
-    global redis_client
-
-    # ---- Startup logic here ----
-    redis_client = Redis(
+def build_redis_client() -> Redis:
+    # module-level so that tools (eg: benchmarks/load.py) can swap in another client
+    return Redis(
         host=settings.redis_host,
         port=settings.redis_port,
         db=settings.redis_db,
-        decode_responses=True
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+        health_check_interval=settings.redis_health_check_interval
     )
 
-    # Expose redis in app.state (best practice)
+@asynccontextmanager
+async def app_lifespan(app: FastAPI):
+    global redis_client, vendor_http_clients
+
+    # ---- Startup logic here ----
+    configure_tracing() # no-op unless tracing_enabled
+    redis_client = build_redis_client()
+
+    # long-lived, pooled http clients (one per vendor) reused across requests
+    vendor_http_clients = build_vendor_http_clients()
+
+    # Expose redis and the vendor clients in app.state (best practice)
     app.state.redis = redis_client
+    app.state.vendor_http_clients = vendor_http_clients
+
+    # long-running tasks, cancelled at shutdown
+    background_tasks: list[Task] = []
+    # keep the in-process L1 cache coherent with the writes of the other workers
+    if settings.l1_cache_enabled:
+        background_tasks.append(create_task(run_l1_invalidation_listener(redis_client)))
+    # hand the best vendor changes published by any worker to the subscriptions held by this one
+    if settings.change_notifications_enabled:
+        background_tasks.append(create_task(run_change_listener(redis_client)))
+    # mirror the shared unknown-sku filter in memory
+    if settings.unknown_sku_filter_enabled:
+        background_tasks.append(create_task(run_unknown_sku_filter_sync(redis_client)))
+    # top-K metrics and the optional pre-warming of the hot skus
+    if settings.hot_sku_tracking_enabled:
+        background_tasks.append(create_task(sku_service.run_hot_sku_maintenance(redis_client, vendor_http_clients)))
+    # fill the cache ahead of the traffic, in the background so the worker starts serving right away
+    if settings.warmup_on_startup:
+        background_tasks.append(create_task(run_startup_warmup(redis_client, vendor_http_clients, sku_service)))
 
     try: # Yield control to the app
         yield
     
     finally: # ---- Shutdown logic here ----
+        for task in background_tasks:
+            task.cancel()
+        # a task that already failed (eg: the warm-up) must not break the shutdown either
+        await gather(*background_tasks, return_exceptions=True)
+        if vendor_http_clients:
+            await close_vendor_http_clients(vendor_http_clients)
         if redis_client:
             await redis_client.aclose()
             # print("🔌 Redis connection closed.")
+        shutdown_tracing()
@@ -0,0 +1,38 @@
+from httpx import AsyncClient, Limits, Timeout
+
+from app.config.config import settings
+from app.external_clients.registry import VENDOR_REGISTRY
+from app.switch import switch
+from simulation.transports import build_simulated_transport, fetch_profile_per_vendor
+
+# one long-lived client per vendor, keyed by vendor name
+VendorHTTPClients = dict[str, AsyncClient]
+
+def fetch_timeout_per_vendor() -> dict[str, float]:
+    return {vendor_name: adapter.timeout for vendor_name, adapter in VENDOR_REGISTRY.items()}
+
+def build_vendor_http_clients() -> VendorHTTPClients:
+    # the keep-alive pool is what saves the TCP+TLS handshake on every cache miss (and every retry)
+    limits = Limits(
+        max_connections=settings.vendor_http_max_connections,
+        max_keepalive_connections=settings.vendor_http_max_keepalive_connections,
+        keepalive_expiry=settings.vendor_http_keepalive_expiry
+    )
+
+    # simulated vendors answer in memory, everything above the transport stays the production code path
+    simulated_profiles = fetch_profile_per_vendor() if switch.SwitchValues.IS_SIMULATED_VENDORS_ENABLED else None
+
+    # separate clients (and hence separate pools) so that a slow vendor cannot starve the others
+    return {
+        vendor_name: AsyncClient(
+            timeout=Timeout(timeout),
+            limits=limits,
+            http2=settings.vendor_http2_enabled,
+            transport=build_simulated_transport(vendor_name, simulated_profiles[vendor_name]) if simulated_profiles else None
+        )
+        for vendor_name, timeout in fetch_timeout_per_vendor().items()
+    }
+
+async def close_vendor_http_clients(clients: VendorHTTPClients):
+    for client in clients.values():
+        await client.aclose()
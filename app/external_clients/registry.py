@@ -0,0 +1,123 @@
+from operator import attrgetter
+from typing import Any, Callable, NamedTuple
+from pydantic import BaseModel
+
+import app.schemas.vendor.models as models
+from app.config.config import settings
+from app.core.constants import Constants
+from app.switch import switch
+
+# per-vendor rate limit
+class RateLimitPolicy(NamedTuple):
+    request_limit: int # per window
+    window_in_millis: int
+
+# per-vendor circuit breaker
+class BreakerPolicy(NamedTuple):
+    fail_max: int # after these many failures, open the circuit
+    open_duration: int # in seconds
+
+# where the inputs of NormalizedParams live in the vendor's (validated) response model
+class FieldMapping(NamedTuple):
+    price: Callable[[Any], float]
+    inventory: Callable[[Any], int | None]
+    in_stock: Callable[[Any], bool]
+    updated_at: Callable[[Any], int] # freshness timestamp in milliseconds
+
+# everything about a vendor, declared once
+class VendorAdapter(NamedTuple):
+    name: str
+    endpoint: str
+    schema: type[BaseModel] # (lean projection of the) response structure, validated straight from the response bytes
+    mapping: FieldMapping
+    timeout: float # in seconds
+    api_key: str
+    rate_limit: RateLimitPolicy
+    breaker: BreakerPolicy # shared by all the workers via Redis
+    max_concurrency: int # upper bound of the adaptive in-flight calls limit, per worker
+
+# vendor_name -> adapter, the fan-out follows the insertion order
+VENDOR_REGISTRY: dict[str, VendorAdapter] = {}
+
+# small integer codes of the compact cache layout (the position is what's stored in Redis), the negative results
+# first, then every vendor in registration order
+CACHE_VENDOR_NAMES: list[str] = [
+    Constants.BEST_VENDOR_SELECTION_OOS_MESSAGE, Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE
+]
+CACHE_VENDOR_CODES: dict[str, int] = {vendor_name: code for code, vendor_name in enumerate(CACHE_VENDOR_NAMES)}
+
+def register_vendor(adapter: VendorAdapter):
+    VENDOR_REGISTRY[adapter.name] = adapter
+    if adapter.name not in CACHE_VENDOR_CODES:
+        if len(CACHE_VENDOR_NAMES) > 0xFF: raise ValueError("No compact cache code left (8 bits) for " + adapter.name)
+        CACHE_VENDOR_CODES[adapter.name] = len(CACHE_VENDOR_NAMES)
+        CACHE_VENDOR_NAMES.append(adapter.name)
+
+def fetch_vendor_adapter(vendor_name: str) -> VendorAdapter | None:
+    return VENDOR_REGISTRY.get(vendor_name)
+
+# adding a vendor = one more register_vendor() call below (plus its response structure in schemas/)
+# append it after the existing ones: its compact cache code is its position, already stored in Redis for the others
+DEFAULT_RATE_LIMIT = RateLimitPolicy(
+    request_limit=switch.RateLimitParams.GLOBAL_REQUEST_LIMIT,
+    window_in_millis=switch.RateLimitParams.GLOBAL_WINDOW_IN_MILLIS
+)
+DEFAULT_BREAKER = BreakerPolicy(
+    fail_max=switch.CircuitBreakerParams.DEFAULT_CB_MAX_FAIL,
+    open_duration=switch.CircuitBreakerParams.DEFAULT_CB_OPEN_DURATION
+)
+
+register_vendor(VendorAdapter(
+    name=Constants.VENDORA_NAME,
+    endpoint=Constants.VENDORA_ENDPOINT,
+    schema=models.VendorAOffer,
+    mapping=FieldMapping(
+        price=attrgetter("price"),
+        inventory=attrgetter("inventory"),
+        in_stock=attrgetter("product_in_stock"),
+        updated_at=attrgetter("last_updated")
+    ),
+    timeout=settings.vendora_api_timeout,
+    api_key=switch.PrivateVault.API_KEY_FOR_VENDORA,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    breaker=DEFAULT_BREAKER,
+    max_concurrency=switch.VendorConcurrencyParams.DEFAULT_MAX_CONCURRENT_CALLS
+))
+
+register_vendor(VendorAdapter(
+    name=Constants.VENDORB_NAME,
+    endpoint=Constants.VENDORB_ENDPOINT,
+    schema=models.VendorBOffer,
+    mapping=FieldMapping(
+        price=attrgetter("cost"),
+        inventory=attrgetter("inventory.product_inventory"),
+        in_stock=lambda resp: resp.inventory.stock_status == models.VendorBStockStatus.in_stock,
+        updated_at=attrgetter("last_refresh_time")
+    ),
+    timeout=settings.vendorb_api_timeout,
+    api_key=switch.PrivateVault.API_KEY_FOR_VENDORB,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    breaker=DEFAULT_BREAKER,
+    max_concurrency=switch.VendorConcurrencyParams.DEFAULT_MAX_CONCURRENT_CALLS
+))
+
+# known for slow responses & errors, hence the stricter circuit breaker
+register_vendor(VendorAdapter(
+    name=Constants.VENDORC_NAME,
+    endpoint=Constants.VENDORC_ENDPOINT,
+    schema=models.VendorCOffer,
+    mapping=FieldMapping(
+        price=attrgetter("details.product_price"),
+        inventory=attrgetter("details.p_inventory"),
+        in_stock=lambda resp: resp.details.p_stock == models.VendorCStockStatus.in_stock,
+        updated_at=attrgetter("details_updated_at")
+    ),
+    timeout=settings.vendorc_api_timeout,
+    api_key=switch.PrivateVault.API_KEY_FOR_VENDORC,
+    rate_limit=DEFAULT_RATE_LIMIT,
+    breaker=BreakerPolicy(
+        fail_max=switch.CircuitBreakerParams.VENDORC_CB_MAX_FAIL,
+        open_duration=switch.CircuitBreakerParams.VENDORC_CB_OPEN_DURATION
+    ),
+    max_concurrency=switch.VendorConcurrencyParams.DEFAULT_MAX_CONCURRENT_CALLS
+))
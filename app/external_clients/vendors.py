@@ -1,227 +1,118 @@
-from asyncio import sleep
-from random import uniform
 import time
+from asyncio import CancelledError
 from fastapi import HTTPException
-from httpx import AsyncClient
-from jsonpickle import decode
+from httpx import AsyncClient, Response
 from redis.asyncio import Redis
-from tenacity import retry, stop_after_attempt, wait_fixed
-from aiobreaker import CircuitBreaker
-from datetime import timedelta
 
-from app.core.constants import Constants
+from app.external_clients.registry import VENDOR_REGISTRY, VendorAdapter
+from app.resilience.circuit_breaker import ensure_circuit_closed, record_call_result
+from app.resilience.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.resilience.deadline import Deadline
 from app.resilience.rate_limiter import exceeds_rate_limit
-from app.instrumentation.metrics import VENDOR_FAILURES, VENDOR_LATENCY
-from app.schemas.vendor.models import CaseForVendorC, GenericVendorResponse, ResponseStatus
+from app.resilience.retry import call_with_retries
+from app.instrumentation.metrics import VENDOR_CONCURRENCY_REJECTIONS, VENDOR_FAILURES, VENDOR_LATENCY
+from app.instrumentation.tracing import span
+from app.schemas.vendor.models import GenericVendorResponse, ResponseStatus
 from app.switch import switch
-from simulation.simulators import SimulatorA, SimulatorB, SimulatorC
 
-# retry logic
-retry_policy = retry(
-    stop=stop_after_attempt(1 + Constants.VENDOR_API_RETRIES),
-    wait=wait_fixed(Constants.DELAY_BETWEEN_RETRIES)
-)
+# per-vendor adaptive cap on in-flight calls, so one slow vendor can't hog all the coroutines and sockets
+vendor_concurrency_limiters: dict[str, AdaptiveConcurrencyLimiter] = {
+    vendor_name: AdaptiveConcurrencyLimiter(vendor_name, adapter.max_concurrency)
+    for vendor_name, adapter in VENDOR_REGISTRY.items()
+}
 
-# circuit breaker for vendorC
-vendorC_circuit_breaker = CircuitBreaker(
-    fail_max=switch.CircuitBreakerParams.VENDORC_CB_MAX_FAIL, # open after 3 consecutive failures
-    timeout_duration=timedelta(
-        seconds=switch.CircuitBreakerParams.VENDORC_CB_OPEN_DURATION) # half-open after 30s elapse
-)
+'''
+The per-vendor call_vendorA/B/C functions were merged into call_vendor once the vendor-specific bits
+(endpoint, api key, timeout, rate limit, breaker, response structure) moved into the registry.
+Logic unique to a vendor belongs in its VendorAdapter declaration.
+'''
 
 class VendorClient:
-    # async call to vendorA
+    # async call to any registered vendor
     @staticmethod
-    @retry_policy
-    async def call_vendorA(sku: str, redis_client: Redis) -> GenericVendorResponse:
+    async def call_vendor(
+        adapter: VendorAdapter, sku: str, redis_client: Redis, http_client: AsyncClient, deadline: Deadline
+    ) -> GenericVendorResponse:
         # define in one place, reuse everywhere
-        vendor_name_local = Constants.VENDORA_NAME
-
-        # mock via json-files
-        if switch.SwitchValues.IS_MOCKING_VIA_FILE:
-            # get mock_file path
-            fpath = SimulatorA(sku).mock_file_path
-            # read file
-            with open(fpath, "r") as mock_file:
-                respA = decode(mock_file.read())
-            mock_file.close()
-            # return response
-            return GenericVendorResponse(
-                    vendor_name=vendor_name_local, 
-                    response_status=ResponseStatus.success,
-                    response_body=respA
+        vendor_name_local = adapter.name
+        breaker = adapter.breaker
+        limiter = vendor_concurrency_limiters[vendor_name_local]
+
+        req_headers = None # no request-headers by default
+        if switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED:
+            req_headers = {"x-api-key": adapter.api_key}
+
+        async def send() -> Response:
+            # pooled client from app_lifespan, the timeout is configured per vendor on the client itself
+            return await http_client.get(adapter.endpoint, params={"sku": sku}, headers=req_headers)
+
+        # one attempt, retried by call_with_retries only for retryable outcomes
+        async def attempt() -> Response:
+            # fail fast while the vendor is down, before spending a rate limit token
+            await ensure_circuit_closed(vendor_name_local, redis_client)
+
+            # every attempt is a vendor call, so every attempt is rate limited
+            if switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED and await exceeds_rate_limit(
+                vendor_name_local, redis_client, adapter.rate_limit.request_limit, adapter.rate_limit.window_in_millis
+            ): 
+                raise HTTPException(
+                    429, f"Rate limit exceeded: {adapter.rate_limit.request_limit} requests per {adapter.rate_limit.window_in_millis}ms"
                 )
-        else: # mock via actual API calls
-            req_headers = None # no request-headers by default
-            exceeds_RL = False # doesn't exceed rate limit by default
-            if switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED:
-                req_headers = {"x-api-key": switch.PrivateVault.API_KEY_FOR_VENDORA}
-                exceeds_RL = await exceeds_rate_limit(vendor_name_local, redis_client) # test RL for vendor
-            
-            # start timer to log vendor latency
-            latency_watcher_start = time.perf_counter()
-            try:
-                if exceeds_RL: 
-                    raise HTTPException(
-                        429, f"Rate limit exceeded: {switch.RateLimitParams.GLOBAL_REQUEST_LIMIT} requests/min"
-                    )
-
-                async with AsyncClient(headers=req_headers, timeout=Constants.VENDOR_API_TIMEOUT) as clientA:
-                    respA = await clientA.get(Constants.VENDORA_ENDPOINT)
-                    respA.raise_for_status() # gets caught in the next block if HTTP Error
-
-                    # success
-                    return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.success,
-                        response_body=respA.json()
-                    )
-            except BaseException as errA:
-                # log vendor failure
-                VENDOR_FAILURES.labels(vendor=vendor_name_local).inc()
 
-                # return response
-                return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.error, # error
-                        response_body=errA # for further processing if needed
-                    )
-            finally: # log vendor latency
-                time_elapsed = time.perf_counter() - latency_watcher_start
-                VENDOR_LATENCY.labels(vendor=vendor_name_local).observe(time_elapsed)
-    
-    # async call to vendorB
-    @staticmethod
-    @retry_policy
-    async def call_vendorB(sku: str, redis_client: Redis) -> GenericVendorResponse:
-        # define in one place, reuse everywhere
-        vendor_name_local = Constants.VENDORB_NAME
-
-        # mock via json-files
-        if switch.SwitchValues.IS_MOCKING_VIA_FILE:
-            # get mock_file path
-            fpath = SimulatorB(sku).mock_file_path
-            # read file
-            with open(fpath, "r") as mock_file:
-                respB = decode(mock_file.read())
-            mock_file.close()
-            # return response
-            return GenericVendorResponse(
-                    vendor_name=vendor_name_local, 
-                    response_status=ResponseStatus.success,
-                    response_body=respB
-                )
-        else: # mock via actual API calls
-            req_headers = None # no request-headers by default
-            exceeds_RL = False # doesn't exceed rate limit by default
-            if switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED:
-                req_headers = {"x-api-key": switch.PrivateVault.API_KEY_FOR_VENDORB}
-                exceeds_RL = await exceeds_rate_limit(vendor_name_local, redis_client) # test RL for vendor
-            
             # start timer to log vendor latency
             latency_watcher_start = time.perf_counter()
+            dropped = True # until a response arrives
+            cancelled = False
             try:
-                if exceeds_RL: 
-                    raise HTTPException(
-                        429, f"Rate limit exceeded: {switch.RateLimitParams.GLOBAL_REQUEST_LIMIT} requests/min"
-                    )
-
-                async with AsyncClient(headers=req_headers, timeout=Constants.VENDOR_API_TIMEOUT) as clientB:
-                    respB = await clientB.get(Constants.VENDORB_ENDPOINT)
-                    respB.raise_for_status() # gets caught in the next block if HTTP Error
-
-                    # success
-                    return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.success,
-                        response_body=respB.json()
-                    )
-            except BaseException as errB: 
-                # log vendor failure
-                VENDOR_FAILURES.labels(vendor=vendor_name_local).inc()
-
-                # return response
-                return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.error, # error
-                        response_body=errB # for further processing if needed
-                    )
-            finally: # log vendor latency
+                with span(f"vendor.{vendor_name_local}"): # bounded: one phase per registered vendor
+                    resp = await send()
+                dropped = False
+            except CancelledError: # cut short by the request deadline, which callers can set (X-Request-Deadline-Ms)
+                cancelled = True
+                raise
+            except Exception: # timeouts, transport errors
+                await record_call_result(vendor_name_local, redis_client, breaker.fail_max, breaker.open_duration, False)
+                raise
+            finally: # log vendor latency, the same sample drives the concurrency limit
                 time_elapsed = time.perf_counter() - latency_watcher_start
                 VENDOR_LATENCY.labels(vendor=vendor_name_local).observe(time_elapsed)
+                # a cancelled call says nothing about the vendor, it only gives its slot back (see the finally below)
+                if not cancelled: limiter.on_sample(time_elapsed, dropped)
+
+            # 5xx means the vendor is struggling, 4xx is about the request
+            await record_call_result(
+                vendor_name_local, redis_client, breaker.fail_max, breaker.open_duration, resp.status_code < 500
+            )
+            resp.raise_for_status() # gets caught by call_with_retries, then in the next block if not retried
+            return resp
+
+        # shed right away rather than queue behind a vendor that is already saturated
+        if not limiter.try_acquire():
+            VENDOR_CONCURRENCY_REJECTIONS.labels(vendor=vendor_name_local).inc()
+            return GenericVendorResponse(
+                vendor_name=vendor_name_local,
+                response_status=ResponseStatus.error,
+                response_body=ConcurrencyLimitExceeded(f"Concurrency limit reached for {vendor_name_local}")
+            )
 
-    '''
-    Even though currently the logic for both the above functions is similar,
-    separating them into two different funcs serves well for future usecases 
-    which might require extra logic unique to each vendor (separation of concerns)
-    [UPDATE]: The two functions are more easily mergeable now after 
-    the introduction of Any yet keeping it separate for the same reason mentioned above. 
-    '''
+        try:
+            resp = await call_with_retries(vendor_name_local, deadline, attempt)
 
-    # async call to vendorC
-    @staticmethod
-    @retry_policy
-    async def call_vendorC(sku: str, redis_client: Redis) -> GenericVendorResponse:
-        # define in one place, reuse everywhere
-        vendor_name_local = Constants.VENDORC_NAME
-
-        # call simulator for vendorC
-        sim_vendorC = SimulatorC(sku)
+            # success
+            return GenericVendorResponse(
+                vendor_name=vendor_name_local, 
+                response_status=ResponseStatus.success,
+                response_body=resp.content # raw bytes, decoded and validated in one pass during normalization
+            )
+        except Exception as err: # CancelledError (deadline exceeded) is not caught on purpose
+            # log vendor failure
+            VENDOR_FAILURES.labels(vendor=vendor_name_local).inc()
 
-        # mock via json-files
-        if sim_vendorC.case_for_vendorC != CaseForVendorC.fail:
-            # get mock_file path
-            fpath = sim_vendorC.mock_file_path
-            # if case = slow, then sleep
-            if sim_vendorC.case_for_vendorC == CaseForVendorC.slow:
-                await sleep(uniform(0.0, Constants.VENDOR_API_TIMEOUT/2))
-                # print("VendorC is slow!")
-            # read file
-            with open(fpath, "r") as mock_file:
-                respC = decode(mock_file.read())
-            mock_file.close()
             # return response
             return GenericVendorResponse(
-                    vendor_name=Constants.VENDORC_NAME, 
-                    response_status=ResponseStatus.success,
-                    response_body=respC
+                    vendor_name=vendor_name_local, 
+                    response_status=ResponseStatus.error, # error
+                    response_body=err # for further processing if needed
                 )
-        else: # mock via actual API calls
-            # print("VendorC must fail!")
-            req_headers = None # no request-headers by default
-            exceeds_RL = False # doesn't exceed rate limit by default
-            if switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED:
-                req_headers = {"x-api-key": switch.PrivateVault.API_KEY_FOR_VENDORC}
-                exceeds_RL = await exceeds_rate_limit(Constants.VENDORC_NAME, redis_client) # test RL for vendor
-            
-            # start timer to log vendor latency
-            latency_watcher_start = time.perf_counter()
-            try:
-                if exceeds_RL: 
-                    raise HTTPException(
-                        429, f"Rate limit exceeded: {switch.RateLimitParams.GLOBAL_REQUEST_LIMIT} requests/min"
-                    )
-
-                async with AsyncClient(headers=req_headers, timeout=Constants.VENDOR_API_TIMEOUT) as clientC:
-                    respC = await vendorC_circuit_breaker.call_async(clientC.get, Constants.VENDORC_ENDPOINT)
-                    respC.raise_for_status() # gets caught in the next block if HTTP Error
-
-                    # success
-                    return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.success,
-                        response_body=respC.json()
-                    )
-            except BaseException as errC: 
-                # log vendor failure
-                VENDOR_FAILURES.labels(vendor=vendor_name_local).inc()
-
-                # return response
-                return GenericVendorResponse(
-                        vendor_name=vendor_name_local, 
-                        response_status=ResponseStatus.error, # error
-                        response_body=errC # for further processing if needed
-                    )
-            finally: # log vendor latency
-                time_elapsed = time.perf_counter() - latency_watcher_start
-                VENDOR_LATENCY.labels(vendor=vendor_name_local).observe(time_elapsed)
+        finally:
+            limiter.release()
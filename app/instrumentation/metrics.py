@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 REQUEST_COUNT = Counter(
     "http_requests_total",
@@ -12,6 +12,13 @@ REQUEST_LATENCY = Histogram(
     ["method", "endpoint"]          # <-- parameters to track
 )
 
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
 VENDOR_FAILURES = Counter(
     "vendor_failures_total",
     "Number of failed vendor requests",
@@ -24,3 +31,151 @@ VENDOR_LATENCY = Histogram(
     ["vendor"]
 )
 
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Cache misses that waited on an already running refresh instead of fanning out to the vendors",
+    ["scope"] # "local" (same worker) or "redis" (another worker holds the lease)
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Best-vendor cache lookups",
+    ["tier", "result"] # tier: "l1" or "redis", result: "hit" or "miss"
+)
+
+BACKGROUND_REFRESHES = Counter(
+    "background_refreshes_total",
+    "Best-vendor entries refreshed in the background while the cached value was served",
+    ["reason"] # "stale" (past the soft TTL) or "early" (probabilistic early refresh)
+)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Vendor rate limit checks",
+    ["vendor", "source", "allowed"] # source: "redis" (script) or "lease" (locally leased token)
+)
+
+VENDOR_DEADLINE_MISSES = Counter(
+    "vendor_deadline_misses_total",
+    "Vendor responses that didn't arrive within the request deadline",
+    ["vendor"]
+)
+
+PARTIAL_DECISIONS = Counter(
+    "partial_best_vendor_decisions_total",
+    "Best-vendor decisions made without the responses of all the vendors"
+)
+
+VENDOR_RETRIES = Counter(
+    "vendor_retries_total",
+    "Vendor request retries",
+    ["vendor", "reason"] # reason: "timeout", "transport", "5xx" or "429"
+)
+
+VENDOR_RETRIES_SKIPPED = Counter(
+    "vendor_retries_skipped_total",
+    "Retryable vendor failures that were not retried",
+    ["vendor", "cause"] # cause: "deadline" (no time left) or "budget" (retry budget exhausted)
+)
+
+UNKNOWN_SKU_FILTER_REJECTIONS = Counter(
+    "unknown_sku_filter_rejections_total",
+    "Requests rejected by the unknown-sku Bloom filter before reaching the service"
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state as last seen by this worker (0 = closed, 1 = half-open, 2 = open)",
+    ["vendor"],
+    multiprocess_mode="livemax" # across workers: the most open view wins
+)
+
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state transitions, counted by the worker that caused them",
+    ["vendor", "from_state", "to_state"]
+)
+
+VENDOR_CONCURRENCY_LIMIT = Gauge(
+    "vendor_concurrency_limit",
+    "Adaptive limit of in-flight calls per vendor, summed over the live workers",
+    ["vendor"],
+    multiprocess_mode="livesum"
+)
+
+VENDOR_CONCURRENCY_REJECTIONS = Counter(
+    "vendor_concurrency_rejections_total",
+    "Vendor calls shed because the adaptive concurrency limit was reached",
+    ["vendor"]
+)
+
+PHASE_LATENCY = Histogram(
+    "request_phase_latency_seconds",
+    "Time spent per phase of a request (cache read/write, rate limit, vendor call, normalization)",
+    ["phase"]
+)
+
+HOT_SKU_TRAFFIC_SHARE = Gauge(
+    "hot_sku_traffic_share",
+    "Share of the requests that went to the top-K skus (per worker, latest value)",
+    multiprocess_mode="livemostrecent"
+)
+
+HOT_SKU_HIT_RATIO = Gauge(
+    "hot_sku_cache_hit_ratio",
+    "Cache hit ratio of the top-K skus (per worker, latest value)",
+    multiprocess_mode="livemostrecent"
+)
+
+HOT_SKU_PREWARMS = Counter(
+    "hot_sku_prewarms_total",
+    "Top-K skus refreshed ahead of their cache expiry",
+    ["result"] # "refreshed" or "failed"
+)
+
+WARMUP_SKUS = Counter(
+    "warmup_skus_total",
+    "Skus processed by the catalog warm-up",
+    ["result"] # "warmed", "skipped" (already cached), "partial" (not cached) or "failed"
+)
+
+WARMUP_PROGRESS = Gauge(
+    "warmup_progress_ratio",
+    "Share of the warm-up sku list processed so far",
+    multiprocess_mode="livemax"
+)
+
+WARMUP_THROUGHPUT = Gauge(
+    "warmup_throughput_skus_per_second",
+    "Skus processed per second by the running warm-up",
+    multiprocess_mode="livemax"
+)
+
+REDIS_DEGRADED = Gauge(
+    "redis_degraded",
+    "1 while this worker skips Redis after a failed or slow call (in-process fallbacks in use)",
+    multiprocess_mode="livemax"
+)
+
+REDIS_FALLBACKS = Counter(
+    "redis_fallbacks_total",
+    "Redis calls that fell back to their in-process alternative (timeout, error or degraded mode)",
+    ["operation"]
+)
+
+BEST_VENDOR_CHANGES_PUBLISHED = Counter(
+    "best_vendor_changes_published_total",
+    "Skus whose best vendor changed on write, published to the subscribers"
+)
+
+BEST_VENDOR_CHANGES_DELIVERED = Counter(
+    "best_vendor_changes_delivered_total",
+    "Best vendor change events sent to subscribed clients"
+)
+
+ACTIVE_SUBSCRIPTIONS = Gauge(
+    "active_subscriptions",
+    "Open best vendor change subscriptions",
+    multiprocess_mode="livesum"
+)
+
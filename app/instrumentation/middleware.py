@@ -1,17 +1,70 @@
-import time
-from fastapi import Request, Response
-from .metrics import REQUEST_COUNT, REQUEST_LATENCY
+import re
+from time import perf_counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-async def prometheus_middleware(request: Request, call_next):
-    start = time.time()
-    response: Response = await call_next(request)
+from app.config.config import settings
+from .metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_PROGRESS
+from .tracing import build_server_timing_header, request_phases
 
-    processing_time = time.time() - start
-    method = request.method
-    endpoint = request.url.path
-    status = response.status_code
+# label for requests that matched no route (404s, scanners), so that arbitrary paths don't become time series
+UNMATCHED_ROUTE = "<unmatched>"
 
-    REQUEST_LATENCY.labels(method, endpoint).observe(processing_time)
-    REQUEST_COUNT.labels(method, endpoint, status).inc()
+def fetch_route_template(scope: Scope) -> str:
+    # FastAPI puts the matched route in the scope while routing, eg: "/products/{sku}" rather than "/products/ABC123"
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
 
-    return response
+# W3C trace context: 32 lowercase hex characters, all zeros being invalid
+TRACE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+INVALID_TRACE_ID = "0" * 32
+
+def fetch_trace_id(scope: Scope) -> str | None:
+    # W3C trace context: "traceparent: 00-<trace-id>-<parent-id>-<flags>"
+    # client-controlled, anything else is dropped (an exemplar over 128 chars would make prometheus_client raise)
+    for name, value in scope["headers"]:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) != 4: return None
+            trace_id = parts[1]
+            return trace_id if TRACE_ID_PATTERN.fullmatch(trace_id) and trace_id != INVALID_TRACE_ID else None
+    return None
+
+# plain ASGI rather than @app.middleware("http"), which wraps every request in BaseHTTPMiddleware's extra
+# task and streams; here the request only passes through one coroutine
+class PrometheusMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500 # unless the app gets to send a response
+        phases: list[tuple[str, float]] = []
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if phases: # where the time went, readable right in the browser's devtools
+                    header = build_server_timing_header(phases, perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        start = perf_counter()
+        token = request_phases.set(phases)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_phases.reset(token)
+            processing_time = perf_counter() - start
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+
+            endpoint = fetch_route_template(scope) # known only once the router has run
+            trace_id = fetch_trace_id(scope) if settings.metrics_exemplars_enabled else None
+            exemplar = {"trace_id": trace_id} if trace_id else None
+
+            REQUEST_LATENCY.labels(method, endpoint).observe(processing_time, exemplar)
+            REQUEST_COUNT.labels(method, endpoint, status).inc(exemplar=exemplar)
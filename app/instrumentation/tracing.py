@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Iterator
+
+from app.config.config import settings
+from .metrics import PHASE_LATENCY
+
+'''
+Lightweight spans over the phases of a request (cache reads/writes, rate limiting, each vendor call,
+normalization). Every span feeds PHASE_LATENCY, and the spans of the current request are collected for
+its Server-Timing header (see PrometheusMiddleware). OpenTelemetry is optional: without it (or with
+tracing_enabled off) a span is just two perf_counter() calls.
+'''
+
+# (phase, seconds) of the current request, set by the middleware; tasks spawned by the request
+# (eg: the vendor fan-out) copy the context and so append to the same list
+request_phases: ContextVar[list[tuple[str, float]] | None] = ContextVar("request_phases", default=None)
+
+tracer: Any = None # opentelemetry Tracer once configure_tracing() succeeded
+tracer_provider: Any = None
+
+def configure_tracing():
+    # called from app_lifespan, the OpenTelemetry packages are only needed when tracing is enabled
+    global tracer, tracer_provider
+    if not settings.tracing_enabled: return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as err: # misconfiguration, better caught at startup than silently untraced
+        raise RuntimeError("tracing_enabled requires opentelemetry-sdk and opentelemetry-exporter-otlp") from err
+
+    tracer_provider = TracerProvider(resource=Resource.create({"service.name": settings.tracing_service_name}))
+    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)))
+    trace.set_tracer_provider(tracer_provider)
+    tracer = trace.get_tracer(__name__)
+
+def shutdown_tracing():
+    global tracer, tracer_provider
+    if tracer_provider: tracer_provider.shutdown() # flushes the spans still buffered
+    tracer, tracer_provider = None, None
+
+def record_phase(phase: str, duration: float):
+    PHASE_LATENCY.labels(phase=phase).observe(duration)
+    phases = request_phases.get()
+    if phases is not None: phases.append((phase, duration))
+
+@contextmanager
+def span(phase: str) -> Iterator[None]:
+    # keep phase names bounded (no skus in them), they're metric labels
+    start = perf_counter()
+    if tracer is None: # no-op fast path
+        try:
+            yield
+        finally:
+            record_phase(phase, perf_counter() - start)
+        return
+
+    with tracer.start_as_current_span(phase):
+        try:
+            yield
+        finally:
+            record_phase(phase, perf_counter() - start)
+
+def build_server_timing_header(phases: list[tuple[str, float]], total: float) -> str:
+    # repeated phases (eg: retried vendor calls) are summed, in order of first appearance
+    durations: dict[str, float] = {}
+    for phase, duration in phases:
+        durations[phase] = durations.get(phase, 0.0) + duration
+    durations["total"] = total
+    return ", ".join(f"{phase};dur={duration * 1000:.1f}" for phase, duration in durations.items())
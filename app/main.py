@@ -1,18 +1,36 @@
-from fastapi import FastAPI, Response
-from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import os
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client.openmetrics import exposition as openmetrics
 from app.core.lifespan_events import app_lifespan
-from app.instrumentation.middleware import prometheus_middleware
+from app.instrumentation.middleware import PrometheusMiddleware
 from app.routers.sku import router as sku_router # your routers
+from app.routers.admin import router as admin_router
+from app.routers.subscriptions import router as subscriptions_router
 
 app = FastAPI(lifespan=app_lifespan)
 
 # ---- Register Middleware ----
-app.middleware("http")(prometheus_middleware)
+app.add_middleware(PrometheusMiddleware)
 
 # ---- Routers ----
 app.include_router(sku_router)
+app.include_router(admin_router)
+app.include_router(subscriptions_router)
 
 # ---- Prometheus Endpoint ----
+# with several workers (gunicorn, see docker/gunicorn.conf.py) each process only sees its own samples,
+# so the per-worker files in PROMETHEUS_MULTIPROC_DIR are merged on every scrape instead
+def build_metrics_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ: return REGISTRY # single process (fastapi dev, benchmarks)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
 @app.get("/metrics")
-def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
+def metrics(request: Request):
+    registry = build_metrics_registry()
+    # exemplars only exist in the OpenMetrics format, served when the scraper asks for it
+    if "application/openmetrics-text" in request.headers.get("accept", ""):
+        return Response(openmetrics.generate_latest(registry), media_type=openmetrics.CONTENT_TYPE_LATEST)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
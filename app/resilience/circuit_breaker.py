@@ -0,0 +1,150 @@
+from collections import defaultdict
+from time import monotonic, time
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from app.instrumentation.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_TRANSITIONS
+from app.resilience.redis_guard import run_with_budget
+from app.switch import switch
+
+'''
+Circuit breaker shared by all the workers: the state of each vendor's breaker lives in a Redis hash
+(state, consecutive failures, open_until) and only changes through the Lua scripts below, so a breaker
+tripped by one worker is open for everyone. Each worker keeps a snapshot of it that is at most
+SNAPSHOT_TTL_IN_MILLIS old, hence a closed breaker costs no Redis access per call.
+
+closed --(fail_max consecutive failures)--> open --(open_duration elapses)--> half_open
+half_open --(trial call succeeds)--> closed, half_open --(trial call fails)--> open
+'''
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2} # for the gauge
+
+# all scripts return {state, failures, open_until (epoch millis), previous state[, trial granted]}
+# and use Redis' own clock, so that all the workers agree on "now"
+ACQUIRE_TRIAL_SCRIPT = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call("HGET", KEYS[1], "state") or "closed"
+local failures = tonumber(redis.call("HGET", KEYS[1], "failures") or 0)
+local open_until = tonumber(redis.call("HGET", KEYS[1], "open_until") or 0)
+local trial_until = tonumber(redis.call("HGET", KEYS[1], "trial_until") or 0)
+
+if state == "closed" then return {state, failures, open_until, state, 0} end
+if state == "open" and now < open_until then return {state, failures, open_until, state, 0} end
+if state == "half_open" and now < trial_until then return {state, failures, open_until, state, 0} end
+
+-- exactly one trial call across all the workers, another one is allowed if it never reports back
+redis.call("HSET", KEYS[1], "state", "half_open", "trial_until", now + tonumber(ARGV[1]))
+return {"half_open", failures, open_until, state, 1}
+"""
+
+RECORD_FAILURE_SCRIPT = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call("HGET", KEYS[1], "state") or "closed"
+local open_until = tonumber(redis.call("HGET", KEYS[1], "open_until") or 0)
+
+if state == "open" then return {state, 0, open_until, state} end -- late failure of a call made before the trip
+
+local failures = redis.call("HINCRBY", KEYS[1], "failures", 1)
+if state == "half_open" or failures >= tonumber(ARGV[1]) then
+    open_until = now + tonumber(ARGV[2])
+    redis.call("HSET", KEYS[1], "state", "open", "failures", 0, "open_until", open_until)
+    return {"open", 0, open_until, state}
+end
+return {state, failures, open_until, state}
+"""
+
+RECORD_SUCCESS_SCRIPT = """
+local state = redis.call("HGET", KEYS[1], "state") or "closed"
+local open_until = tonumber(redis.call("HGET", KEYS[1], "open_until") or 0)
+
+if state == "open" then return {state, 0, open_until, state} end -- late success of a call made before the trip
+
+redis.call("HSET", KEYS[1], "state", "closed", "failures", 0)
+return {"closed", 0, open_until, state}
+"""
+
+scripts: dict[str, AsyncScript] = {}
+
+def fetch_key_for_circuit_breaker_namespace() -> str:
+    return "circuit_breaker:"
+
+def fetch_script(redis_client: Redis, script: str) -> AsyncScript:
+    # registered once, afterwards it runs via EVALSHA
+    if script not in scripts:
+        scripts[script] = redis_client.register_script(script)
+    return scripts[script]
+
+class CircuitOpenError(Exception):
+    pass
+
+# this worker's view of a vendor's breaker
+class BreakerSnapshot:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0 # epoch millis
+        self.fetched_at = float("-inf") # monotonic seconds
+
+    def is_stale(self) -> bool:
+        return monotonic() - self.fetched_at > switch.CircuitBreakerParams.SNAPSHOT_TTL_IN_MILLIS / 1000
+
+    def update(self, vendor_name: str, state: str, failures: int, open_until: int):
+        self.state, self.failures, self.open_until = state, failures, open_until
+        self.fetched_at = monotonic()
+        CIRCUIT_BREAKER_STATE.labels(vendor=vendor_name).set(STATE_VALUE[state])
+
+breaker_snapshots: defaultdict[str, BreakerSnapshot] = defaultdict(BreakerSnapshot) # vendor_name -> snapshot
+
+def apply_script_result(vendor_name: str, result: list) -> bool:
+    # refresh the snapshot, export the transition if this call caused one, return the trial flag (if any)
+    state, failures, open_until, previous_state = (
+        value.decode() if isinstance(value, bytes) else value for value in result[:4]
+    )
+    breaker_snapshots[vendor_name].update(vendor_name, state, int(failures), int(open_until))
+    if state != previous_state:
+        CIRCUIT_BREAKER_TRANSITIONS.labels(vendor=vendor_name, from_state=previous_state, to_state=state).inc()
+    return len(result) > 4 and int(result[4]) == 1
+
+async def ensure_circuit_closed(vendor_name: str, redis_client: Redis):
+    # raises CircuitOpenError if the call must not go out, Redis trouble leaves the breaker as it was (fail open)
+    snapshot = breaker_snapshots[vendor_name]
+    redis_key = f"{fetch_key_for_circuit_breaker_namespace()}{vendor_name}"
+    if snapshot.is_stale():
+        fields = await run_with_budget(
+            "circuit_breaker", lambda: redis_client.hmget(redis_key, ["state", "failures", "open_until"]), fallback=None
+        )
+        if fields is None: return # no shared state to go by, keep calling
+        state, failures, open_until = fields
+        snapshot.update(vendor_name, state or CLOSED, int(failures or 0), int(open_until or 0))
+
+    if snapshot.state == CLOSED: return
+    if snapshot.state == OPEN and time() * 1000 < snapshot.open_until:
+        raise CircuitOpenError(f"Circuit open for {vendor_name}")
+
+    # cooled down (or already half-open): only the worker that gets the trial slot goes ahead
+    result = await run_with_budget("circuit_breaker", lambda: fetch_script(redis_client, ACQUIRE_TRIAL_SCRIPT)(
+        keys=[redis_key], args=[switch.CircuitBreakerParams.HALF_OPEN_TRIAL_LEASE_IN_MILLIS], client=redis_client
+    ), fallback=None)
+    if result is None: return
+
+    if not apply_script_result(vendor_name, result) and breaker_snapshots[vendor_name].state != CLOSED:
+        raise CircuitOpenError(f"Circuit {breaker_snapshots[vendor_name].state} for {vendor_name}")
+
+async def record_call_result(vendor_name: str, redis_client: Redis, fail_max: int, open_duration: int, succeeded: bool):
+    snapshot = breaker_snapshots[vendor_name]
+    # the common case, a success on a healthy breaker, needs no write
+    if succeeded and snapshot.state == CLOSED and snapshot.failures == 0: return
+
+    redis_key = f"{fetch_key_for_circuit_breaker_namespace()}{vendor_name}"
+    if succeeded:
+        record = lambda: fetch_script(redis_client, RECORD_SUCCESS_SCRIPT)(keys=[redis_key], client=redis_client)
+    else:
+        record = lambda: fetch_script(redis_client, RECORD_FAILURE_SCRIPT)(
+            keys=[redis_key], args=[fail_max, open_duration * 1000], client=redis_client
+        )
+    result = await run_with_budget("circuit_breaker", record, fallback=None)
+    if result is None: return # the breaker must never fail the call itself
+    apply_script_result(vendor_name, result)
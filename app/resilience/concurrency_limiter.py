@@ -0,0 +1,49 @@
+from app.instrumentation.metrics import VENDOR_CONCURRENCY_LIMIT
+from app.switch import switch
+
+'''
+Adaptive bulkhead per vendor (AIMD, as in Netflix' concurrency-limits): the number of in-flight calls
+allowed grows by one per window of healthy calls and is cut by BACKOFF_RATIO whenever a call is dropped
+(timeout, transport error) or takes much longer than the vendor's usual latency. Calls cancelled by the request
+deadline release their slot without a sample. Calls beyond the limit are shed right away instead of queueing
+behind a slow vendor.
+'''
+
+class ConcurrencyLimitExceeded(Exception):
+    pass
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, vendor_name: str, max_limit: int):
+        self.vendor_name = vendor_name
+        self.min_limit = min(switch.VendorConcurrencyParams.MIN_CONCURRENT_CALLS, max_limit)
+        self.max_limit = max_limit
+        self.limit = float(min(switch.VendorConcurrencyParams.INITIAL_CONCURRENT_CALLS, max_limit))
+        self.in_flight = 0
+        self.baseline_latency: float | None = None # seconds, slow moving average of the healthy samples
+        VENDOR_CONCURRENCY_LIMIT.labels(vendor=vendor_name).set(int(self.limit))
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit): return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def on_sample(self, latency: float, dropped: bool):
+        # one sample per vendor attempt, the same ones that feed VENDOR_LATENCY
+        params = switch.VendorConcurrencyParams
+        is_slow = self.baseline_latency is not None and latency > self.baseline_latency * params.LATENCY_TOLERANCE
+
+        if dropped or is_slow: # multiplicative decrease
+            self.limit = max(self.min_limit, self.limit * params.BACKOFF_RATIO)
+        else:
+            # the baseline only learns from healthy samples, so that a slowdown can't become the new normal
+            self.baseline_latency = latency if self.baseline_latency is None else (
+                self.baseline_latency + params.BASELINE_SMOOTHING * (latency - self.baseline_latency)
+            )
+            # additive increase, only while the limit is actually being used
+            if self.in_flight * 2 >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        VENDOR_CONCURRENCY_LIMIT.labels(vendor=self.vendor_name).set(int(self.limit))
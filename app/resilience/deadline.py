@@ -0,0 +1,21 @@
+from time import monotonic
+
+from app.config.config import settings
+
+# end-to-end latency budget of one request, passed down explicitly like the redis client
+class Deadline:
+    def __init__(self, budget_in_millis: float, is_caller_supplied: bool = False):
+        self.expires_at = monotonic() + budget_in_millis / 1000
+        # a budget set by the caller (X-Request-Deadline-Ms) only binds that caller, see get_best_vendor_for_sku
+        self.is_caller_supplied = is_caller_supplied
+
+    def remaining(self) -> float: # in seconds, never negative
+        return max(0.0, self.expires_at - monotonic())
+
+    def expired(self) -> bool:
+        return monotonic() >= self.expires_at
+
+def build_request_deadline(override_in_millis: int | None = None) -> Deadline:
+    # a caller may ask for a different budget, but never beyond the configured maximum
+    budget = override_in_millis if override_in_millis else settings.request_deadline_ms
+    return Deadline(min(budget, settings.max_request_deadline_ms), is_caller_supplied=bool(override_in_millis))
@@ -1,7 +1,13 @@
 
-from time import time
+from collections import defaultdict
+from time import monotonic
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
+from app.instrumentation.metrics import RATE_LIMIT_DECISIONS
+from app.config.config import settings
+from app.instrumentation.tracing import span
+from app.resilience.redis_guard import redis_health, run_with_budget
 from app.switch import switch
 
 '''
@@ -10,25 +16,115 @@ Q. Where does the request argument come from in FastAPI?
 - You do not create it manually. FastAPI gives you the object for the current HTTP request.
 '''
 
-async def exceeds_rate_limit(vendor_name: str, redis_client: Redis) -> bool:
-    # local variables to avoid long names to make code more readable
-    WINDOW = switch.RateLimitParams.GLOBAL_WINDOW_IN_MILLIS
-    REQUEST_LIMIT = switch.RateLimitParams.GLOBAL_REQUEST_LIMIT
+# GCRA (generic cell rate algorithm): one key per vendor holding the "theoretical arrival time" (TAT),
+# so it's O(1) memory per vendor, atomic and a single round trip. Redis' own clock is used so that
+# all the workers agree on "now". Grants as many of the requested tokens as fit (0 => rate limited).
+GCRA_SCRIPT = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local emission_interval = tonumber(ARGV[1])
+local burst_tolerance = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
 
-    now = time() # current timestamp in millis
-    window_start = now - WINDOW # requests older than window_start i.e. less than it need to be removed
-    redis_key = f"rate_limit_store:{vendor_name}" # the redis_key [TODO] make "rate_limit_store:" a value picked from .env file or Constants
+local tat = tonumber(redis.call("GET", KEYS[1]) or now)
+if tat < now then tat = now end
 
-    # step 1: Count active elements
-    count = await redis_client.zcount(redis_key, window_start, now)
+local granted = math.floor((burst_tolerance - (tat - now)) / emission_interval)
+if granted > requested then granted = requested end
+if granted <= 0 then return 0 end
 
-    # step 2: check rate-limit
-    if count >= REQUEST_LIMIT: # ideally == should suffice
-        return True
-    else: # step 3: Add current timestamp
-        await redis_client.zadd(redis_key, {str(now): now})
+local new_tat = tat + granted * emission_interval
+redis.call("SET", KEYS[1], tostring(new_tat), "PX", math.ceil(new_tat - now))
+return granted
+"""
+
+gcra_script: AsyncScript | None = None
+
+def fetch_key_for_rate_limit_namespace() -> str:
+    return "rate_limit_tat:"
+
+def fetch_gcra_script(redis_client: Redis) -> AsyncScript:
+    # registered once, afterwards it runs via EVALSHA
+    global gcra_script
+    if gcra_script is None:
+        gcra_script = redis_client.register_script(GCRA_SCRIPT)
+    return gcra_script
+
+# tokens this worker took from Redis ahead of time, spent without any Redis access
+class TokenLease:
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0 # monotonic seconds, unspent tokens are dropped after this
+
+    def take(self) -> bool:
+        if self.tokens > 0 and monotonic() < self.expires_at:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refill(self, tokens: int):
+        self.tokens = tokens
+        self.expires_at = monotonic() + switch.RateLimitParams.LEASE_DURATION_IN_MILLIS / 1000
+
+token_leases: defaultdict[str, TokenLease] = defaultdict(TokenLease) # vendor_name -> lease
+
+# same GCRA, in process, used while Redis is unavailable: approximate since each worker only knows its own calls,
+# hence every worker gets degraded_rate_limit_share of the vendor's limit
+class LocalGCRA:
+    def __init__(self):
+        self.tat = 0.0 # monotonic millis
 
-    # step 4: Remove timestamps outside sliding window
-    await redis_client.zremrangebyscore(redis_key, 0, window_start)
+    def acquire(self, requested: int, request_limit: int, window_in_millis: int) -> int:
+        now = monotonic() * 1000
+        emission_interval = window_in_millis / max(1.0, request_limit * settings.degraded_rate_limit_share)
+        tat = max(self.tat, now)
+        granted = min(requested, int((window_in_millis - (tat - now)) // emission_interval))
+        if granted <= 0: return 0
+        self.tat = tat + granted * emission_interval
+        return granted
+
+local_rate_limiters: defaultdict[str, LocalGCRA] = defaultdict(LocalGCRA) # vendor_name -> limiter
+
+async def acquire_tokens(
+    vendor_name: str, redis_client: Redis, requested: int, request_limit: int | None = None, window_in_millis: int | None = None
+) -> int:
+    # local variables to avoid long names to make code more readable, per-vendor policy or the global one
+    WINDOW = window_in_millis or switch.RateLimitParams.GLOBAL_WINDOW_IN_MILLIS
+    REQUEST_LIMIT = request_limit or switch.RateLimitParams.GLOBAL_REQUEST_LIMIT
+
+    redis_key = f"{fetch_key_for_rate_limit_namespace()}{vendor_name}"
+    with span("rate_limit"):
+        granted = await run_with_budget("rate_limit", lambda: fetch_gcra_script(redis_client)(
+            keys=[redis_key],
+            args=[WINDOW / REQUEST_LIMIT, WINDOW, requested], # emission interval and burst tolerance in millis
+            client=redis_client
+        ), fallback=None)
+    if granted is None: # Redis unavailable, fail open to the local approximation
+        return local_rate_limiters[vendor_name].acquire(requested, REQUEST_LIMIT, WINDOW)
+    return int(granted)
+
+def fetch_decision_source() -> str:
+    return "local" if redis_health.is_degraded() else "redis"
+
+async def exceeds_rate_limit(
+    vendor_name: str, redis_client: Redis, request_limit: int | None = None, window_in_millis: int | None = None
+) -> bool:
+    if not switch.SwitchValues.IS_RATE_LIMIT_TOKEN_LEASING_ENABLED:
+        allowed = await acquire_tokens(vendor_name, redis_client, 1, request_limit, window_in_millis) == 1
+        RATE_LIMIT_DECISIONS.labels(vendor=vendor_name, source=fetch_decision_source(), allowed=str(allowed)).inc()
+        return not allowed
+
+    # leasing: most calls are served from the local lease, only an empty lease goes to Redis
+    lease = token_leases[vendor_name]
+    if lease.take():
+        RATE_LIMIT_DECISIONS.labels(vendor=vendor_name, source="lease", allowed="True").inc()
+        return False
+
+    granted = await acquire_tokens(vendor_name, redis_client, switch.RateLimitParams.LEASE_SIZE, request_limit, window_in_millis)
+    if granted == 0:
+        RATE_LIMIT_DECISIONS.labels(vendor=vendor_name, source=fetch_decision_source(), allowed="False").inc()
+        return True
 
+    lease.refill(granted - 1) # one is spent right away on this call
+    RATE_LIMIT_DECISIONS.labels(vendor=vendor_name, source=fetch_decision_source(), allowed="True").inc()
     return False
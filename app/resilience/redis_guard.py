@@ -0,0 +1,54 @@
+from asyncio import TimeoutError as AsyncTimeoutError, wait_for
+from time import monotonic
+from typing import Awaitable, Callable, TypeVar
+from redis.exceptions import RedisError
+
+from app.config.config import settings
+from app.instrumentation.metrics import REDIS_DEGRADED, REDIS_FALLBACKS
+
+T = TypeVar("T")
+
+'''
+Fail-open wrapper for the Redis calls on the request path (cache, rate limiter, ...): every call gets a latency
+budget, and a call that times out or fails puts this worker in degraded mode for redis_degraded_cooldown seconds.
+While degraded, Redis is skipped altogether and the callers use their in-process fallback, so a Redis outage
+costs cache hits (and rate limit precision) instead of the availability of the endpoint.
+Batch calls (MGET, pipelines) get a budget that grows with their number of commands, so that a large batch
+running over the single-command budget isn't mistaken for an outage (and cancelled halfway through).
+'''
+
+class RedisHealth:
+    def __init__(self):
+        self.degraded_until = 0.0 # monotonic seconds
+
+    def is_degraded(self) -> bool:
+        return monotonic() < self.degraded_until
+
+    def mark_failure(self):
+        self.degraded_until = monotonic() + settings.redis_degraded_cooldown
+        REDIS_DEGRADED.set(1)
+
+    def mark_recovered(self):
+        if self.degraded_until:
+            self.degraded_until = 0.0
+            REDIS_DEGRADED.set(0)
+
+redis_health = RedisHealth()
+
+def fetch_budget(commands: int) -> float: # in seconds
+    return (settings.redis_operation_budget_ms + (commands - 1) * settings.redis_operation_budget_per_command_ms) / 1000
+
+async def run_with_budget(operation: str, call: Callable[[], Awaitable[T]], fallback: T, commands: int = 1) -> T:
+    # call is only invoked (i.e. the command only sent) when Redis is considered healthy
+    # commands: how many commands (or keys, for MGET and the like) the call carries
+    if redis_health.is_degraded():
+        REDIS_FALLBACKS.labels(operation=operation).inc()
+        return fallback
+    try:
+        result = await wait_for(call(), timeout=fetch_budget(commands))
+    except (AsyncTimeoutError, RedisError, OSError):
+        redis_health.mark_failure()
+        REDIS_FALLBACKS.labels(operation=operation).inc()
+        return fallback
+    redis_health.mark_recovered()
+    return result
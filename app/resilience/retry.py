@@ -0,0 +1,89 @@
+from asyncio import sleep
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from random import uniform
+from time import monotonic, time
+from typing import Awaitable, Callable, TypeVar
+from httpx import HTTPStatusError, TimeoutException, TransportError
+
+from app.instrumentation.metrics import VENDOR_RETRIES, VENDOR_RETRIES_SKIPPED
+from app.resilience.deadline import Deadline
+from app.switch import switch
+
+T = TypeVar("T")
+
+# token bucket per vendor: retries spend tokens, so during an outage they stop amplifying the load
+class RetryBudget:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.refilled_at = monotonic()
+
+    def try_spend(self) -> bool:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.refill_per_second)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+retry_budgets: defaultdict[str, RetryBudget] = defaultdict(
+    lambda: RetryBudget(switch.RetryParams.BUDGET_CAPACITY, switch.RetryParams.BUDGET_REFILL_PER_SECOND)
+) # vendor_name -> budget
+
+def parse_retry_after(value: str | None) -> float | None: # in seconds
+    if not value: return None
+    try: # either delta-seconds ...
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try: # ... or an HTTP date
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_retryable(error: Exception) -> tuple[str, float | None] | None: # (reason, retry_after) or None if not retryable
+    if isinstance(error, TimeoutException): # checked before TransportError, it's a subclass
+        return "timeout", None
+    if isinstance(error, TransportError): # connection reset, refused etc.
+        return "transport", None
+    if isinstance(error, HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return "429", parse_retry_after(error.response.headers.get("retry-after"))
+        if status >= 500:
+            return "5xx", None
+    return None # 4xx, our own rate limiter, an open circuit etc. won't get better by retrying
+
+def compute_backoff(attempt: int, retry_after: float | None) -> float: # in seconds
+    if retry_after is not None: # the vendor told us how long to wait
+        return retry_after
+    # exponential backoff with full jitter
+    cap = switch.RetryParams.MAX_DELAY_IN_MILLIS / 1000
+    base = switch.RetryParams.BASE_DELAY_IN_MILLIS / 1000
+    return uniform(0, min(cap, base * 2 ** attempt))
+
+async def call_with_retries(vendor_name: str, deadline: Deadline, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+    attempt = 0
+    while True:
+        try:
+            return await attempt_fn()
+        except Exception as error:
+            retryable = classify_retryable(error)
+            if retryable is None or attempt >= switch.RetryParams.MAX_RETRIES:
+                raise
+            reason, retry_after = retryable
+
+            delay = compute_backoff(attempt, retry_after)
+            if delay >= deadline.remaining(): # the retry couldn't finish in time anyway
+                VENDOR_RETRIES_SKIPPED.labels(vendor=vendor_name, cause="deadline").inc()
+                raise
+            if not retry_budgets[vendor_name].try_spend():
+                VENDOR_RETRIES_SKIPPED.labels(vendor=vendor_name, cause="budget").inc()
+                raise
+
+            VENDOR_RETRIES.labels(vendor=vendor_name, reason=reason).inc()
+            await sleep(delay)
+            attempt += 1
@@ -0,0 +1,89 @@
+from asyncio import Task, create_task, shield, sleep
+from time import monotonic
+from typing import Awaitable, Callable, TypeVar
+from uuid import uuid4
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from app.instrumentation.metrics import COALESCED_REQUESTS
+from app.resilience.deadline import Deadline
+from app.resilience.redis_guard import run_with_budget
+from app.switch import switch
+
+T = TypeVar("T")
+
+# deletes the lease only if we still own it (it might have expired and been taken by another worker)
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+release_lease_script: AsyncScript | None = None
+
+def fetch_release_lease_script(redis_client: Redis) -> AsyncScript:
+    # registered once, afterwards it runs via EVALSHA
+    global release_lease_script
+    if release_lease_script is None:
+        release_lease_script = redis_client.register_script(RELEASE_LEASE_SCRIPT)
+    return release_lease_script
+
+class SingleFlight:
+    '''
+    In-process request coalescing: concurrent callers for the same key await one shared task.
+    The work runs in its own task so that a cancelled caller (eg: client disconnect) doesn't cancel it for everyone else.
+    '''
+    def __init__(self):
+        self.in_flight: dict[str, Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self.in_flight.get(key)
+        if task is None: # we are the leader
+            task = create_task(fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.forget(key, done))
+        else: # piggyback on the running task
+            COALESCED_REQUESTS.labels(scope="local").inc()
+        return await shield(task)
+
+    def forget(self, key: str, task: Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+async def run_under_redis_lease(
+    redis_client: Redis,
+    lease_key: str,
+    compute: Callable[[], Awaitable[T]],
+    read_cached: Callable[[], Awaitable[T | None]],
+    deadline: Deadline
+) -> T:
+    '''
+    Cross-worker coalescing: only the worker holding the short lease runs compute(),
+    the others poll read_cached() until the value lands, the lease runs out or the request deadline passes.
+    '''
+    LEASE = switch.CoalescingParams.LEASE_DURATION_IN_MILLIS
+    POLL_INTERVAL = switch.CoalescingParams.POLL_INTERVAL_IN_MILLIS / 1000
+
+    token = uuid4().hex
+    # without Redis there's nobody to coordinate with, so compute it ourselves
+    if await run_with_budget("lease", lambda: redis_client.set(lease_key, token, nx=True, px=LEASE), fallback=True):
+        try:
+            return await compute()
+        finally:
+            await run_with_budget("lease", lambda: fetch_release_lease_script(redis_client)(
+                keys=[lease_key], args=[token], client=redis_client
+            ), fallback=None)
+
+    # someone else is refreshing this key, wait for the value to land
+    COALESCED_REQUESTS.labels(scope="redis").inc()
+    give_up_at = monotonic() + min(LEASE / 1000, deadline.remaining()) # never past the request deadline
+    while monotonic() < give_up_at:
+        await sleep(POLL_INTERVAL)
+        value = await read_cached()
+        if value is not None:
+            return value
+
+    # the lease holder died or is too slow, compute it ourselves
+    # (past the deadline every vendor call is cut short, and compute() doesn't cache a decision made on no answers)
+    return await compute()
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query
+
+from app.config.config import settings
+from app.routers.sku import sku_service # the instance serving the traffic, so its counts
+from app.schemas.admin.models import HotSKUEntry, HotSKUsResponse
+
+router = APIRouter(prefix="/admin")
+
+# the most requested skus of the worker that serves this request, with their cache hits/misses
+@router.get("/hot-skus")
+async def get_hot_skus(
+    limit: int = Query(settings.hot_sku_top_k, gt=0, le=settings.hot_sku_capacity)
+) -> HotSKUsResponse:
+    return HotSKUsResponse(
+        total_requests=sku_service.hot_skus.total,
+        skus=[HotSKUEntry(**hot._asdict()) for hot in sku_service.hot_skus.top(limit)]
+    )
@@ -1,9 +1,15 @@
 
-from fastapi import APIRouter, Depends, Path
+from re import fullmatch
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
 from redis.asyncio import Redis
 
+from app.core.constants import Constants
+from app.schemas.sku.models import BatchSKURequest, BatchSKUResponse
 from app.services.sku_service import SKUService
-from app.core.dependencies import get_redis # should be the only place in your project with this import
+from app.services.sku_filter import is_known_unknown_sku
+from app.core.dependencies import get_redis, get_vendor_http_clients # should be the only place in your project with this import
+from app.external_clients.http_clients import VendorHTTPClients
+from app.resilience.deadline import Deadline, build_request_deadline
 
 router = APIRouter()
 sku_service = SKUService()
@@ -11,15 +17,28 @@ sku_service = SKUService()
 async def validate_sku(
     sku: str = Path(
         ...,                        # <--- tells FastAPI: this is a required func param                
-        min_length=3,
-        max_length=20,
-        pattern=r"^[a-zA-Z0-9]+$"
+        min_length=Constants.SKU_MIN_LENGTH,
+        max_length=Constants.SKU_MAX_LENGTH,
+        pattern=Constants.SKU_PATTERN
     )
 ):
     # Extra business rules if needed
     # if sku.startswith("X"): raise HTTPException(...)
     return sku
 
+# end-to-end latency budget, callers may pass their own via the X-Request-Deadline-Ms header
+async def get_request_deadline(
+    x_request_deadline_ms: int | None = Header(None, gt=0)
+) -> Deadline:
+    return build_request_deadline(x_request_deadline_ms)
+
+# same rules as validate_sku, for skus that arrive in a request body instead of the path
+def is_valid_sku(sku: str) -> bool:
+    return (
+        Constants.SKU_MIN_LENGTH <= len(sku) <= Constants.SKU_MAX_LENGTH
+        and fullmatch(Constants.SKU_PATTERN, sku) is not None
+    )
+
 # [TODO]: Move validation clutter to a separate function inside this file
 # [SOLUTION]: Two: (1) Dependency func OR (2) Type Alias
 # Type Alias gives syntactically the cleanest code but cannot accomodate custom business logic
@@ -27,6 +46,33 @@ async def validate_sku(
 # if this validation is used by many endpoints in this file, then move it 
 # into a dedicated file "validators.py" or smth similar under this directory
 @router.get("/products/{sku}")
-async def get_sku(sku: str = Depends(validate_sku), redis: Redis = Depends(get_redis)) -> str: # return type can be made into an Enum also if the vendors don't change frequently
-    return await sku_service.get_best_vendor_for_sku(sku, redis)
-    
\ No newline at end of file
+async def get_sku(
+    sku: str = Depends(validate_sku), 
+    redis: Redis = Depends(get_redis),
+    http_clients: VendorHTTPClients = Depends(get_vendor_http_clients),
+    deadline: Deadline = Depends(get_request_deadline)
+) -> str: # return type can be made into an Enum also if the vendors don't change frequently
+    # skus already known to be unknown never reach Redis or the vendors
+    if is_known_unknown_sku(sku): raise HTTPException(status_code=404, detail="Unknown sku")
+
+    best_vendor = await sku_service.get_best_vendor_for_sku(sku, redis, http_clients, deadline)
+    if best_vendor == Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE:
+        raise HTTPException(status_code=404, detail="Unknown sku")
+    return best_vendor
+
+# one round trip for many skus: invalid skus are reported per sku instead of failing the whole batch
+@router.post("/products/batch")
+async def get_skus_in_batch(
+    batch: BatchSKURequest,
+    redis: Redis = Depends(get_redis),
+    http_clients: VendorHTTPClients = Depends(get_vendor_http_clients)
+) -> BatchSKUResponse:
+    valid_skus = [sku for sku in batch.skus if is_valid_sku(sku)]
+    errors = {sku: "Invalid sku" for sku in batch.skus if not is_valid_sku(sku)}
+    errors.update({sku: "Unknown sku" for sku in valid_skus if is_known_unknown_sku(sku)})
+    valid_skus = [sku for sku in valid_skus if sku not in errors]
+
+    best_vendors, fetch_errors = await sku_service.get_best_vendors_for_skus(valid_skus, redis, http_clients)
+    errors.update(fetch_errors)
+
+    return BatchSKUResponse(best_vendors=best_vendors, errors=errors)
@@ -0,0 +1,58 @@
+import json
+from asyncio import TimeoutError as AsyncTimeoutError, wait_for
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+
+from app.config.config import settings
+from app.core.dependencies import get_redis
+from app.instrumentation.metrics import BEST_VENDOR_CHANGES_DELIVERED
+from app.routers.sku import is_valid_sku
+from app.services.cache_service import get_best_vendors_for_skus_from_redis
+from app.services.change_feed import change_feed
+from app.switch.switch import BatchParams
+
+router = APIRouter()
+
+def format_best_vendor_event(sku: str, vendor: str | None) -> str:
+    return f"event: best_vendor\ndata: {json.dumps({'sku': sku, 'vendor': vendor})}\n\n"
+
+async def stream_best_vendor_changes(request: Request, redis: Redis, skus: list[str]):
+    # subscribed here rather than in the endpoint, so that the finally below always runs for it
+    subscription = change_feed.subscribe(skus)
+    try:
+        # the current values first, a change published meanwhile is queued (subscribed before the read)
+        for sku, vendor in (await get_best_vendors_for_skus_from_redis(redis, subscription.skus)).items():
+            if subscription.should_send(sku, vendor):
+                yield format_best_vendor_event(sku, vendor)
+
+        while not await request.is_disconnected():
+            try:
+                sku, vendor = await wait_for(subscription.events.get(), timeout=settings.subscription_heartbeat_interval)
+            except AsyncTimeoutError:
+                yield ": heartbeat\n\n" # a comment line, ignored by EventSource
+                continue
+            if subscription.should_send(sku, vendor):
+                BEST_VENDOR_CHANGES_DELIVERED.inc()
+                yield format_best_vendor_event(sku, vendor)
+    finally:
+        change_feed.unsubscribe(subscription)
+
+# server-sent events: the best vendor of each sku now, then every time it changes
+# eg: curl -N "localhost:8000/subscriptions?sku=ABC123&sku=XYZ789"
+@router.get("/subscriptions")
+async def subscribe_to_best_vendors(
+    request: Request,
+    sku: list[str] = Query(..., min_length=1, max_length=BatchParams.MAX_SKUS_PER_BATCH),
+    redis: Redis = Depends(get_redis)
+) -> StreamingResponse:
+    if not settings.change_notifications_enabled:
+        raise HTTPException(status_code=503, detail="Change notifications are disabled")
+    invalid_skus = [s for s in sku if not is_valid_sku(s)]
+    if invalid_skus: raise HTTPException(status_code=422, detail=f"Invalid skus: {', '.join(invalid_skus)}")
+
+    return StreamingResponse(
+        stream_best_vendor_changes(request, redis, list(dict.fromkeys(sku))), # deduplicated, order kept
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # no buffering by nginx-like proxies
+    )
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+# one entry of the hot skus top-K, counts are per worker
+class HotSKUEntry(BaseModel):
+    sku: str
+    count: int # upper bound of the requests for the sku
+    error: int # count - error is a lower bound
+    hits: int
+    misses: int
+
+class HotSKUsResponse(BaseModel):
+    total_requests: int # seen by this worker, tracked or not
+    skus: list[HotSKUEntry]
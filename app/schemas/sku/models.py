@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+from app.switch.switch import BatchParams
+
+# request body for the batch lookup endpoint
+class BatchSKURequest(BaseModel):
+    skus: list[str] = Field(..., min_length=1, max_length=BatchParams.MAX_SKUS_PER_BATCH)
+
+# sku -> best vendor for the resolved skus, sku -> error message for the rest
+class BatchSKUResponse(BaseModel):
+    best_vendors: dict[str, str]
+    errors: dict[str, str]
\ No newline at end of file
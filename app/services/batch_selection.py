@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.core.constants import Constants
+from app.switch.switch import SwitchValues
+
+'''
+Columnar counterpart of SKUServiceHelper.get_best_vendor_from_normalized_tuple_list for catalog-wide recomputes.
+Rows are skus and columns are vendors, given in the same order the scalar function would see them in its input list,
+so that ties are broken the same way (sorted() is stable, the original position is the last sort key here).
+'''
+
+def build_price_stock_matrices(rows: list[list[tuple[int, float, str]]]) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    # list of NormalizedParams lists (one per sku, same vendor order in every row) -> (prices, stocks, vendor_names)
+    vendor_names = [params[2] for params in rows[0]] if rows else []
+    prices = np.array([[params[1] for params in row] for row in rows], dtype=np.float64).reshape(len(rows), len(vendor_names))
+    stocks = np.array([[params[0] for params in row] for row in rows], dtype=np.int64).reshape(len(rows), len(vendor_names))
+    return prices, stocks, vendor_names
+
+def select_best_vendors(
+    prices: np.ndarray, stocks: np.ndarray, vendor_names: list[str], is_rule_upgrade_enabled: bool | None = None
+) -> list[str]:
+    if is_rule_upgrade_enabled is None: is_rule_upgrade_enabled = SwitchValues.IS_PRICE_STOCK_RULE_UPGRADE_ENABLED
+    prices = np.asarray(prices, dtype=np.float64)
+    stocks = np.asarray(stocks, dtype=np.int64)
+    n_skus, n_vendors = prices.shape
+    if n_skus == 0: return []
+
+    # drop all vendors with stock = 0, here: move them behind the ones in stock
+    in_stock = stocks > 0
+    n_in_stock = in_stock.sum(axis=1)
+
+    # sort asc by price, if tie then desc by stock, if tie then by original position (np.lexsort: last key is the primary one)
+    position = np.broadcast_to(np.arange(n_vendors), (n_skus, n_vendors))
+    order = np.lexsort((position, -stocks, prices, ~in_stock), axis=1)
+    sorted_prices = np.take_along_axis(prices, order, axis=1)
+    sorted_stocks = np.take_along_axis(stocks, order, axis=1)
+
+    # default rule: the first one after sorting
+    best_pos = np.zeros(n_skus, dtype=np.intp)
+
+    if is_rule_upgrade_enabled and n_vendors > 1:
+        # the price-diff walk is sequential per sku but runs for all the skus at once, one vendor position at a time
+        best_price = sorted_prices[:, 0].copy()
+        best_stock = sorted_stocks[:, 0].copy()
+        for pos in range(1, n_vendors):
+            curr_price = sorted_prices[:, pos]
+            curr_stock = sorted_stocks[:, pos]
+            # diff is more than 10% and curr_vendor has more stock => curr_vendor becomes best_vendor
+            replace = (pos < n_in_stock) & (best_price * 1.1 < curr_price) & (curr_stock > best_stock)
+            best_pos = np.where(replace, pos, best_pos)
+            best_price = np.where(replace, curr_price, best_price)
+            best_stock = np.where(replace, curr_stock, best_stock)
+
+    best_column = order[np.arange(n_skus), best_pos]
+    best_vendors = np.asarray(vendor_names, dtype=object)[best_column]
+
+    # nothing in stock => OOS message
+    best_vendors[n_in_stock == 0] = Constants.BEST_VENDOR_SELECTION_OOS_MESSAGE
+    return best_vendors.tolist()
@@ -1,18 +1,395 @@
+import json
+from asyncio import CancelledError, sleep
+from collections import OrderedDict
+from time import monotonic, time
+from typing import NamedTuple
+from uuid import uuid4
+from zlib import crc32
 from redis.asyncio import Redis
+
 from app.config.config import settings
+from app.core.constants import Constants
+from app.external_clients.registry import CACHE_VENDOR_CODES, CACHE_VENDOR_NAMES
+from app.instrumentation.metrics import BEST_VENDOR_CHANGES_PUBLISHED, CACHE_LOOKUPS
+from app.instrumentation.tracing import span
+from app.resilience.redis_guard import run_with_budget
+
+# identifies this worker on the invalidation channel, so it can skip its own messages
+WORKER_ID = uuid4().hex
 
 def fetch_key_for_best_vendor_namespace() -> str:
     return "sku:"
 
+def fetch_key_for_negative_namespace() -> str:
+    return "neg:"
+
+def fetch_key_for_best_vendor_lease_namespace() -> str:
+    return "lease:sku:"
+
+def fetch_key_for_vendor_offer_namespace() -> str:
+    return "offer:"
+
+def fetch_channel_for_l1_invalidation() -> str:
+    return "invalidate:sku"
+
+def fetch_channel_for_best_vendor_changes() -> str:
+    return "changes:sku"
+
+# what is stored per sku: the best vendor plus what's needed for stale-while-revalidate and early refresh
+class BestVendorEntry(NamedTuple):
+    vendor_name: str
+    soft_expires_at: float # epoch seconds, past this point the entry is served stale and refreshed in the background
+    compute_time: float # seconds the last refresh took, scales the probabilistic early refresh (XFetch)
+
+def encode_best_vendor_entry(entry: BestVendorEntry) -> str:
+    # compact "vendor|soft_expiry_millis|compute_time_millis" string
+    return f"{entry.vendor_name}|{int(entry.soft_expires_at * 1000)}|{int(entry.compute_time * 1000)}"
+
+def decode_best_vendor_entry(value: str) -> BestVendorEntry:
+    vendor_name, _, rest = value.partition("|")
+    if not rest: # plain vendor name written before soft TTLs existed, treat as stale
+        return BestVendorEntry(vendor_name=vendor_name, soft_expires_at=0.0, compute_time=0.0)
+    soft_expires_at, _, compute_time = rest.partition("|")
+    return BestVendorEntry(
+        vendor_name=vendor_name,
+        soft_expires_at=int(soft_expires_at) / 1000,
+        compute_time=int(compute_time) / 1000
+    )
+
+# normalized offer of one vendor for one sku, cached independently of the best vendor
+class CachedOffer(NamedTuple):
+    stock: int
+    price: float
+    updated_at: int # the vendor's own freshness timestamp, in milliseconds
+
+def encode_cached_offer(offer: CachedOffer) -> str:
+    return f"{offer.stock}|{offer.price!r}|{offer.updated_at}" # repr() round-trips the float exactly
+
+def decode_cached_offer(value: str) -> CachedOffer:
+    stock, price, updated_at = value.split("|")
+    return CachedOffer(stock=int(stock), price=float(price), updated_at=int(updated_at))
+
+# L1: bounded in-process cache with LRU eviction and a TTL, sitting in front of Redis
+class LocalTTLCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl # in seconds
+        self.entries: OrderedDict[str, tuple[float, BestVendorEntry]] = OrderedDict() # key -> (expires_at, value)
+
+    def get(self, key: str) -> BestVendorEntry | None:
+        entry = self.entries.get(key)
+        if entry is None: return None
+
+        expires_at, value = entry
+        if expires_at <= monotonic(): # expired, drop it
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key) # most recently used goes last
+        return value
+
+    def set(self, key: str, value: BestVendorEntry):
+        self.entries[key] = (monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size: # evict the least recently used
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+# never outlives the Redis entry it mirrors
+l1_cache = LocalTTLCache(
+    max_size=settings.l1_cache_max_size,
+    ttl=min(settings.l1_cache_ttl, settings.cache_ttl)
+)
+
+# copy of what this worker read from / wrote to Redis, only served while Redis is unavailable
+degraded_cache = LocalTTLCache(max_size=settings.degraded_cache_max_size, ttl=settings.cache_ttl)
+
+def get_best_vendor_for_sku_from_l1(sku: str) -> BestVendorEntry | None:
+    if not settings.l1_cache_enabled: return None
+    entry = l1_cache.get(sku)
+    CACHE_LOOKUPS.labels(tier="l1", result="hit" if entry else "miss").inc()
+    return entry
+
+# negative tier: out-of-stock and unknown skus live under their own namespace with shorter TTLs,
+# so they don't crowd the positive entries and recover quickly once a vendor restocks or lists the sku
+def fetch_negative_ttl(vendor_name: str) -> int | None:
+    if vendor_name == Constants.BEST_VENDOR_SELECTION_OOS_MESSAGE: return settings.negative_cache_ttl_out_of_stock
+    if vendor_name == Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE: return settings.negative_cache_ttl_unknown_sku
+    return None # not a negative result
+
+def remember_entry(sku: str, entry: BestVendorEntry):
+    if settings.l1_cache_enabled: l1_cache.set(sku, entry)
+    degraded_cache.set(sku, entry)
+
+def pick_cached_value(sku: str, value: str | None, negative_value: str | None) -> BestVendorEntry | None:
+    # the positive entry wins, a write always removes the key of the other tier but both may briefly coexist
+    # a hit in either tier is a Redis hit, the negative tier is broken down on its own for the lookups that reach it
+    CACHE_LOOKUPS.labels(tier="redis", result="hit" if value or negative_value else "miss").inc()
+    if not value: CACHE_LOOKUPS.labels(tier="negative", result="hit" if negative_value else "miss").inc()
+    value = value or negative_value
+    if not value: return None
+    entry = decode_best_vendor_entry(value)
+    remember_entry(sku, entry)
+    return entry
+
+# compact layout (compact_cache_enabled): skus are spread over compact_cache_buckets small hashes, which Redis
+# keeps listpack-encoded, each field holds the entry packed into one integer and expires on its own (HEXPIRE,
+# Redis >= 7.4), so negative entries just get a shorter TTL in the same hash
+def fetch_key_for_best_vendor_bucket_namespace() -> str:
+    return "skuh:"
+
+def fetch_bucket_key_for_sku(sku: str) -> str:
+    return f"{fetch_key_for_best_vendor_bucket_namespace()}{crc32(sku.encode()) % settings.compact_cache_buckets}"
+
+def encode_compact_entry(entry: BestVendorEntry) -> int:
+    # soft expiry in seconds (31 bits) | compute time in millis (16 bits, capped) | vendor code (8 bits)
+    compute_time = min(int(entry.compute_time * 1000), 0xFFFF)
+    return (int(entry.soft_expires_at) << 24) | (compute_time << 8) | CACHE_VENDOR_CODES[entry.vendor_name]
+
+def decode_compact_entry(value: str) -> BestVendorEntry:
+    packed = int(value)
+    return BestVendorEntry(
+        vendor_name=CACHE_VENDOR_NAMES[packed & 0xFF],
+        soft_expires_at=float(packed >> 24),
+        compute_time=((packed >> 8) & 0xFFFF) / 1000
+    )
+
+def group_skus_by_bucket(skus) -> dict[str, list[str]]:
+    buckets: dict[str, list[str]] = {}
+    for sku in skus:
+        buckets.setdefault(fetch_bucket_key_for_sku(sku), []).append(sku)
+    return buckets
+
+# raw lookup of both layouts, one round trip: sku -> entry (None if not cached), None if Redis is unavailable
+async def read_best_vendor_entries(redis: Redis, skus: list[str]) -> dict[str, BestVendorEntry | None] | None:
+    if settings.compact_cache_enabled:
+        buckets = group_skus_by_bucket(skus)
+        async def read():
+            async with redis.pipeline(transaction=False) as pipe:
+                for bucket_key, fields in buckets.items():
+                    pipe.hmget(bucket_key, fields)
+                return await pipe.execute()
+
+        with span("cache_read"):
+            results = await run_with_budget("cache_read", read, fallback=None, commands=len(skus))
+        if results is None: return None
+
+        entries: dict[str, BestVendorEntry | None] = {}
+        for fields, values in zip(buckets.values(), results):
+            for sku, value in zip(fields, values):
+                CACHE_LOOKUPS.labels(tier="redis", result="hit" if value else "miss").inc()
+                entries[sku] = decode_compact_entry(value) if value else None
+                if entries[sku]: remember_entry(sku, entries[sku])
+                # same breakdown as the string layout, where the negative tier is only looked at when there's no positive entry
+                if not entries[sku] or fetch_negative_ttl(entries[sku].vendor_name):
+                    CACHE_LOOKUPS.labels(tier="negative", result="hit" if entries[sku] else "miss").inc()
+        return entries
+
+    # positive keys first, then the negative ones, still a single MGET
+    key_namespace = fetch_key_for_best_vendor_namespace()
+    negative_namespace = fetch_key_for_negative_namespace()
+    with span("cache_read"):
+        values = await run_with_budget("cache_read", lambda: redis.mget(
+            [f"{key_namespace}{sku}" for sku in skus] + [f"{negative_namespace}{sku}" for sku in skus]
+        ), fallback=None, commands=2 * len(skus))
+    if values is None: return None
+    return {sku: pick_cached_value(sku, values[idx], values[len(skus) + idx]) for idx, sku in enumerate(skus)}
+
+async def get_best_vendor_entry_for_sku_from_redis(redis: Redis, sku: str) -> BestVendorEntry | None:
+    # hot skus are served from memory without any Redis traffic
+    entry = get_best_vendor_for_sku_from_l1(sku)
+    if entry: return entry
+
+    entries = await read_best_vendor_entries(redis, [sku])
+    if entries is None: return degraded_cache.get(sku) # Redis unavailable
+    return entries[sku]
+
 async def get_best_vendor_for_sku_from_redis(redis: Redis, sku: str) -> str | None:
+    entry = await get_best_vendor_entry_for_sku_from_redis(redis, sku)
+    return entry.vendor_name if entry else None
+
+async def set_best_vendor_for_sku_in_redis(
+    redis: Redis, sku: str, vendor_name: str, compute_time: float = 0.0,
+    ttl: int = settings.cache_ttl, soft_ttl: int = settings.cache_soft_ttl
+):
+    await set_best_vendors_for_skus_in_redis(redis, {sku: vendor_name}, compute_time, ttl, soft_ttl)
+
+# batch variants: one round trip for all the lookups and one pipeline for all the writes
+async def get_best_vendors_for_skus_from_redis(redis: Redis, skus: list[str]) -> dict[str, str | None]:
+    if not skus: return {}
+
+    found: dict[str, BestVendorEntry | None] = {sku: get_best_vendor_for_sku_from_l1(sku) for sku in skus}
+    remaining = [sku for sku, entry in found.items() if not entry]
+
+    if remaining:
+        entries = await read_best_vendor_entries(redis, remaining)
+        for sku in remaining:
+            found[sku] = degraded_cache.get(sku) if entries is None else entries[sku] # None => Redis unavailable
+
+    return {sku: (entry.vendor_name if entry else None) for sku, entry in found.items()}
+
+async def set_best_vendors_for_skus_in_redis(
+    redis: Redis, best_vendors: dict[str, str], compute_time: float = 0.0,
+    ttl: int = settings.cache_ttl, soft_ttl: int = settings.cache_soft_ttl
+):
+    if not best_vendors: return
+    # ttl is the hard TTL (Redis expiry), soft_ttl marks where stale-while-revalidate kicks in
+    now = time()
+    entries: dict[str, BestVendorEntry] = {}
+    ttls: dict[str, int] = {}
+    for sku, vendor_name in best_vendors.items():
+        negative_ttl = fetch_negative_ttl(vendor_name)
+        # negative entries are simply refetched once expired, no stale serving for them
+        ttls[sku] = min(negative_ttl, ttl) if negative_ttl else ttl
+        soft_expires_at = now + (ttls[sku] if negative_ttl else min(soft_ttl, ttl))
+        entries[sku] = BestVendorEntry(vendor_name=vendor_name, soft_expires_at=soft_expires_at, compute_time=compute_time)
+
     key_namespace = fetch_key_for_best_vendor_namespace()
-    cache_key = f"{key_namespace}{sku}"
-    value = await redis.get(cache_key)
-    if value: # is found
-        return value # return it
-    return None # else return None
+    negative_namespace = fetch_key_for_negative_namespace()
+    # the previous values come back from the same round trip, so that only actual changes get published
+    async def write() -> dict[str, str | None]: # sku -> previous vendor name
+        previous_value_at: dict[str, list[int]] = {} # sku -> positions of the results holding its previous value
+        async with redis.pipeline(transaction=False) as pipe:
+            if settings.compact_cache_enabled:
+                for bucket_key, fields in group_skus_by_bucket(entries).items():
+                    if settings.change_notifications_enabled: # HSET doesn't return the old values
+                        for field_idx, sku in enumerate(fields): previous_value_at[sku] = [len(pipe), field_idx]
+                        pipe.hmget(bucket_key, fields)
+                    pipe.hset(bucket_key, mapping={sku: encode_compact_entry(entries[sku]) for sku in fields})
+                    fields_per_ttl: dict[int, list[str]] = {}
+                    for sku in fields:
+                        fields_per_ttl.setdefault(ttls[sku], []).append(sku)
+                    for field_ttl, ttl_fields in fields_per_ttl.items():
+                        pipe.hexpire(bucket_key, field_ttl, *ttl_fields)
+            else:
+                for sku, entry in entries.items():
+                    key, other_key = f"{key_namespace}{sku}", f"{negative_namespace}{sku}"
+                    if fetch_negative_ttl(entry.vendor_name): key, other_key = other_key, key
+                    previous_value_at[sku] = [len(pipe)]
+                    pipe.set(key, encode_best_vendor_entry(entry), ex=ttls[sku], get=True)
+                    pipe.getdel(other_key) # a sku lives in one tier at a time
+            if settings.l1_cache_enabled: # tell the other workers to drop their copies, in the same round trip
+                pipe.publish(fetch_channel_for_l1_invalidation(), f"{WORKER_ID}:{','.join(entries)}")
+            results = await pipe.execute()
+
+        previous: dict[str, str | None] = {}
+        for sku, position in previous_value_at.items():
+            if settings.compact_cache_enabled:
+                value = results[position[0]][position[1]]
+                previous[sku] = decode_compact_entry(value).vendor_name if value else None
+            else: # from either tier
+                value = results[position[0]] or results[position[0] + 1]
+                previous[sku] = decode_best_vendor_entry(value).vendor_name if value else None
+        return previous
+
+    with span("cache_write"):
+        # a lost write only costs a future miss
+        previous = await run_with_budget("cache_write", write, fallback=None, commands=2 * len(entries))
+
+    for sku, entry in entries.items():
+        remember_entry(sku, entry)
+
+    if settings.change_notifications_enabled and previous is not None:
+        changes = {sku: entry.vendor_name for sku, entry in entries.items() if previous.get(sku) != entry.vendor_name}
+        if changes: await publish_best_vendor_changes(redis, changes)
 
-async def set_best_vendor_for_sku_in_redis(redis: Redis, sku: str, vendor_name: str, ttl: int = settings.cache_ttl):
+async def publish_best_vendor_changes(redis: Redis, changes: dict[str, str]):
+    # one message per write batch, fanned out to the subscribers by every worker's listener (see change_feed.py)
+    await run_with_budget(
+        "change_publish", lambda: redis.publish(fetch_channel_for_best_vendor_changes(), json.dumps(changes)), fallback=None
+    )
+    BEST_VENDOR_CHANGES_PUBLISHED.inc(len(changes))
+
+# seconds left before each sku's best vendor entry expires (None if it's not cached), one pipeline of PTTLs
+# without include_negative, the skus held by the negative tier are left out of the result altogether
+async def get_remaining_ttls_for_skus_from_redis(
+    redis: Redis, skus: list[str], include_negative: bool = True
+) -> dict[str, float | None]:
+    if not skus: return {}
     key_namespace = fetch_key_for_best_vendor_namespace()
-    cache_key = f"{key_namespace}{sku}"
-    await redis.set(cache_key, vendor_name, ex=ttl)
\ No newline at end of file
+    negative_namespace = fetch_key_for_negative_namespace()
+    buckets = group_skus_by_bucket(skus) if settings.compact_cache_enabled else {}
+    async def read():
+        async with redis.pipeline(transaction=False) as pipe:
+            if settings.compact_cache_enabled:
+                for bucket_key, fields in buckets.items():
+                    pipe.hpttl(bucket_key, *fields) # per field
+                    pipe.hmget(bucket_key, fields) # the tier is in the value
+            else: # both tiers, a sku lives in one of them
+                for sku in skus:
+                    pipe.pttl(f"{key_namespace}{sku}")
+                    pipe.pttl(f"{negative_namespace}{sku}")
+            return await pipe.execute()
+
+    results = await run_with_budget("ttl_read", read, fallback=None, commands=2 * len(skus))
+    if results is None: return {} # Redis unavailable, nothing to report
+
+    ttls: dict[str, float | None] = {}
+    if settings.compact_cache_enabled:
+        for fields, bucket_ttls, values in zip(buckets.values(), results[::2], results[1::2]):
+            for sku, ttl, value in zip(fields, bucket_ttls, values):
+                if not include_negative and value and fetch_negative_ttl(decode_compact_entry(value).vendor_name): continue
+                ttls[sku] = ttl / 1000 if ttl >= 0 else None
+    else:
+        for idx, sku in enumerate(skus):
+            ttl, negative_ttl = results[2 * idx], results[2 * idx + 1] # -2 when missing
+            if not include_negative and negative_ttl >= 0: continue
+            ttl = max(ttl, negative_ttl)
+            ttls[sku] = ttl / 1000 if ttl >= 0 else None
+    return ttls
+
+# all the vendors' offers for a sku in one MGET, vendor_name -> offer (None if missing)
+async def get_vendor_offers_for_sku_from_redis(redis: Redis, sku: str, vendor_names: list[str]) -> dict[str, CachedOffer | None]:
+    if not vendor_names: return {}
+    key_namespace = fetch_key_for_vendor_offer_namespace()
+    with span("offer_cache_read"):
+        values = await run_with_budget(
+            "offer_cache_read",
+            lambda: redis.mget([f"{key_namespace}{vendor_name}:{sku}" for vendor_name in vendor_names]),
+            fallback=[None] * len(vendor_names), # Redis unavailable, every offer is fetched
+            commands=len(vendor_names)
+        )
+    offers: dict[str, CachedOffer | None] = {}
+    for vendor_name, value in zip(vendor_names, values):
+        CACHE_LOOKUPS.labels(tier="offer", result="hit" if value else "miss").inc()
+        offers[vendor_name] = decode_cached_offer(value) if value else None
+    return offers
+
+# vendor_name -> (offer, ttl in millis), each offer expires when the vendor's data would turn stale
+async def set_vendor_offers_for_sku_in_redis(redis: Redis, sku: str, offers: dict[str, tuple[CachedOffer, int]]):
+    if not offers: return
+    key_namespace = fetch_key_for_vendor_offer_namespace()
+    async def write():
+        async with redis.pipeline(transaction=False) as pipe:
+            for vendor_name, (offer, ttl) in offers.items():
+                pipe.set(f"{key_namespace}{vendor_name}:{sku}", encode_cached_offer(offer), px=ttl)
+            await pipe.execute()
+
+    with span("offer_cache_write"):
+        await run_with_budget("offer_cache_write", write, fallback=None, commands=len(offers))
+
+async def run_l1_invalidation_listener(redis: Redis):
+    # long-running task started in app_lifespan, keeps the L1 of this worker coherent with the writes of the others
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(fetch_channel_for_l1_invalidation())
+                while True:
+                    # an explicit read timeout, listen() would trip over the client's (short) socket_timeout when idle
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message["type"] != "message": continue
+                    origin, _, skus = message["data"].partition(":")
+                    if origin == WORKER_ID: continue # our own write, L1 already holds the new value
+                    for sku in skus.split(","):
+                        l1_cache.invalidate(sku)
+        except CancelledError:
+            raise
+        except Exception:
+            # invalidations might have been missed while disconnected, so start from scratch
+            l1_cache.clear()
+            await sleep(1)
\ No newline at end of file
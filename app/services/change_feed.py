@@ -0,0 +1,78 @@
+import json
+from asyncio import CancelledError, Queue, QueueEmpty, QueueFull, sleep
+from redis.asyncio import Redis
+
+from app.config.config import settings
+from app.instrumentation.metrics import ACTIVE_SUBSCRIPTIONS
+from app.services.cache_service import fetch_channel_for_best_vendor_changes
+
+'''
+Push side of the best vendor cache: the writers publish the skus whose best vendor actually changed
+(see set_best_vendors_for_skus_in_redis), every worker runs one listener on that channel and hands the
+changes to the subscriptions it holds. The listener is the only Redis subscriber per worker however many
+clients are connected, a slow client only ever loses its own oldest pending events.
+'''
+
+class Subscription:
+    def __init__(self, skus: list[str]):
+        self.skus = skus
+        self.events: Queue[tuple[str, str | None]] = Queue(maxsize=settings.subscription_queue_size) # (sku, vendor)
+        self.last_sent: dict[str, str | None] = {} # sku -> vendor, so that a client never gets the same value twice
+
+    def push(self, sku: str, vendor: str | None):
+        try:
+            self.events.put_nowait((sku, vendor))
+        except QueueFull: # the client doesn't keep up, the oldest event is the least relevant one
+            try:
+                self.events.get_nowait()
+            except QueueEmpty:
+                pass
+            self.events.put_nowait((sku, vendor))
+
+    def should_send(self, sku: str, vendor: str | None) -> bool:
+        if sku in self.last_sent and self.last_sent[sku] == vendor: return False
+        self.last_sent[sku] = vendor
+        return True
+
+class ChangeFeed:
+    def __init__(self):
+        self.subscriptions_per_sku: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, skus: list[str]) -> Subscription:
+        subscription = Subscription(skus)
+        for sku in skus:
+            self.subscriptions_per_sku.setdefault(sku, set()).add(subscription)
+        ACTIVE_SUBSCRIPTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for sku in subscription.skus:
+            subscriptions = self.subscriptions_per_sku.get(sku)
+            if subscriptions is None: continue
+            subscriptions.discard(subscription)
+            if not subscriptions: del self.subscriptions_per_sku[sku]
+        ACTIVE_SUBSCRIPTIONS.dec()
+
+    def dispatch(self, changes: dict[str, str]):
+        for sku, vendor in changes.items():
+            for subscription in self.subscriptions_per_sku.get(sku, ()):
+                subscription.push(sku, vendor)
+
+change_feed = ChangeFeed()
+
+async def run_change_listener(redis: Redis):
+    # long-running task started in app_lifespan, same loop as run_l1_invalidation_listener
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(fetch_channel_for_best_vendor_changes())
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message["type"] != "message": continue
+                    if change_feed.subscriptions_per_sku: # nobody to tell otherwise
+                        change_feed.dispatch(json.loads(message["data"]))
+        except CancelledError:
+            raise
+        except Exception:
+            # changes published while disconnected are lost, a reconnecting client gets a fresh snapshot
+            await sleep(1)
@@ -0,0 +1,60 @@
+from heapq import heapify, heappop, heappush
+from typing import NamedTuple
+
+'''
+Space-Saving (Metwally et al.): a top-K of the most requested skus in fixed memory, whatever the size of the
+sku space. Only `capacity` skus are counted; a new sku replaces the least counted one and inherits its count
+(recorded as the error), so counts are overestimated by at most `error` and any sku requested more than
+total / capacity times is guaranteed to be in the summary.
+'''
+
+class HotSKU(NamedTuple):
+    sku: str
+    count: int # upper bound of the real number of requests
+    error: int # count - error is a lower bound
+    hits: int # cache hits/misses since the sku entered the summary
+    misses: int
+
+class SpaceSavingTopK:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: dict[str, list[int]] = {} # sku -> [count, error, hits, misses]
+        self.heap: list[tuple[int, str]] = [] # (count, sku), lazy: outdated pairs are skipped when popped
+        self.total = 0 # all the requests recorded, tracked or not
+
+    def record(self, sku: str, hit: bool):
+        self.total += 1
+        counter = self.counters.get(sku)
+        if counter is None:
+            count, error = 1, 0
+            if len(self.counters) >= self.capacity: # evict the least counted sku, the newcomer takes over its count
+                evicted_count = self.pop_min()
+                count, error = evicted_count + 1, evicted_count
+            counter = self.counters[sku] = [count, error, 0, 0]
+        else:
+            counter[0] += 1
+        counter[2 if hit else 3] += 1
+
+        heappush(self.heap, (counter[0], sku))
+        if len(self.heap) > 4 * self.capacity: # drop the outdated pairs, keeps the memory bounded
+            self.heap = [(counter[0], sku) for sku, counter in self.counters.items()]
+            heapify(self.heap)
+
+    def pop_min(self) -> int:
+        while True:
+            count, sku = heappop(self.heap)
+            counter = self.counters.get(sku)
+            if counter is not None and counter[0] == count: # current pair, not an outdated one
+                del self.counters[sku]
+                return count
+
+    def top(self, k: int) -> list[HotSKU]:
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [HotSKU(sku, *counter) for sku, counter in ranked]
+
+    def top_k_stats(self, k: int) -> tuple[float, float]: # (share of the traffic, cache hit ratio) of the top-K
+        top = self.top(k)
+        requests = sum(hot.hits + hot.misses for hot in top)
+        share = requests / self.total if self.total else 0.0
+        hit_ratio = sum(hot.hits for hot in top) / requests if requests else 0.0
+        return share, hit_ratio
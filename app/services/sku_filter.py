@@ -0,0 +1,132 @@
+from asyncio import CancelledError, sleep
+from hashlib import blake2b
+from math import ceil, log
+from time import time
+from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
+
+from app.config.config import settings
+from app.instrumentation.metrics import UNKNOWN_SKU_FILTER_REJECTIONS
+from app.resilience.redis_guard import run_with_budget
+
+'''
+Bloom filter of skus that no vendor knows. The source of truth is a Redis bitmap (shared by all the workers),
+each worker checks a mirror of it in memory, so junk skus are rejected without any Redis or vendor call.
+A false positive would reject a valid sku, hence the low default error rate. Bits can't be cleared, so the
+filter starts over every unknown_sku_filter_rotation seconds (one bitmap per generation, on the timescale of
+the negative tier): a sku listed by a vendor after it was marked unknown is only rejected until then.
+A version counter next to the bitmap tells the workers whether there's anything new to download.
+'''
+
+def fetch_key_for_unknown_sku_filter(generation: int) -> str:
+    return f"filter:unknown_sku:{generation}"
+
+def fetch_key_for_unknown_sku_filter_version(generation: int) -> str:
+    return f"filter:unknown_sku:{generation}:version"
+
+def fetch_filter_generation() -> int:
+    # wall clock, so that all the workers agree on the current generation
+    return int(time() // settings.unknown_sku_filter_rotation)
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        # optimal size and number of hashes for the expected number of items and false positive rate
+        self.size_in_bits = ceil(-capacity * log(error_rate) / (log(2) ** 2))
+        self.hash_count = max(1, round(self.size_in_bits / capacity * log(2)))
+        self.bits = bytearray(ceil(self.size_in_bits / 8))
+        self.generation: int | None = None # the one the bits belong to
+        self.version: str | None = None # of the Redis bitmap last loaded, None if not loaded yet
+
+    def positions(self, item: str) -> list[int]:
+        # double hashing: k positions out of one 128-bit digest
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + idx * h2) % self.size_in_bits for idx in range(self.hash_count)]
+
+    # same bit order as Redis' SETBIT/GETBIT: offset 0 is the most significant bit of the first byte
+    def set_bit(self, offset: int):
+        self.bits[offset >> 3] |= 0x80 >> (offset & 7)
+
+    def get_bit(self, offset: int) -> bool:
+        return bool(self.bits[offset >> 3] & (0x80 >> (offset & 7)))
+
+    def add(self, item: str):
+        for offset in self.positions(item):
+            self.set_bit(offset)
+
+    def might_contain(self, item: str) -> bool:
+        return all(self.get_bit(offset) for offset in self.positions(item))
+
+    def load(self, bitmap: bytes | None):
+        # mirror the Redis bitmap, which may be shorter (trailing zero bytes aren't stored) or gone (expired)
+        bits = bytearray(len(self.bits))
+        if bitmap: bits[:len(bitmap)] = bitmap[:len(bits)]
+        self.bits = bits
+
+    def roll_over(self, generation: int):
+        # a new generation starts empty
+        if generation == self.generation: return
+        self.generation, self.version = generation, None
+        self.bits = bytearray(len(self.bits))
+
+unknown_sku_filter = BloomFilter(
+    capacity=settings.unknown_sku_filter_capacity,
+    error_rate=settings.unknown_sku_filter_error_rate
+)
+
+def is_known_unknown_sku(sku: str) -> bool:
+    # in-memory only, checked by the router before SKUService gets involved
+    if not settings.unknown_sku_filter_enabled: return False
+    unknown_sku_filter.roll_over(fetch_filter_generation())
+    if unknown_sku_filter.might_contain(sku):
+        UNKNOWN_SKU_FILTER_REJECTIONS.inc()
+        return True
+    return False
+
+async def add_unknown_sku(redis: Redis, sku: str):
+    await add_unknown_skus(redis, [sku])
+
+# all the skus in one pipeline, eg: the unknown skus of a batch request
+async def add_unknown_skus(redis: Redis, skus: list[str]):
+    if not settings.unknown_sku_filter_enabled or not skus: return
+    generation = fetch_filter_generation()
+    unknown_sku_filter.roll_over(generation)
+    for sku in skus:
+        unknown_sku_filter.add(sku)
+    key, version_key = fetch_key_for_unknown_sku_filter(generation), fetch_key_for_unknown_sku_filter_version(generation)
+    async def write():
+        async with redis.pipeline(transaction=False) as pipe:
+            for sku in skus:
+                for offset in unknown_sku_filter.positions(sku):
+                    pipe.setbit(key, offset, 1)
+            pipe.incr(version_key)
+            # outlives its generation a little, for the workers still syncing it
+            for expiring_key in (key, version_key):
+                pipe.expire(expiring_key, 2 * settings.unknown_sku_filter_rotation, nx=True)
+            await pipe.execute()
+    # the local copy is updated regardless
+    await run_with_budget(
+        "unknown_sku_filter_write", write, fallback=None, commands=len(skus) * unknown_sku_filter.hash_count + 3
+    )
+
+async def run_unknown_sku_filter_sync(redis: Redis):
+    # long-running task started in app_lifespan, picks up the skus added by the other workers
+    while True:
+        try:
+            generation = fetch_filter_generation()
+            unknown_sku_filter.roll_over(generation)
+            # the bitmap (up to a few MB) is only downloaded when some worker has added to it since the last time
+            version = await redis.get(fetch_key_for_unknown_sku_filter_version(generation))
+            if version is not None and version != unknown_sku_filter.version:
+                bitmap = await redis.execute_command(
+                    "GET", fetch_key_for_unknown_sku_filter(generation), **{NEVER_DECODE: True} # raw bytes, not utf-8
+                )
+                if generation == unknown_sku_filter.generation: # didn't roll over meanwhile
+                    unknown_sku_filter.load(bitmap)
+                    unknown_sku_filter.version = version
+        except CancelledError:
+            raise
+        except Exception:
+            pass # keep the current mirror, try again later
+        await sleep(settings.unknown_sku_filter_sync_interval)
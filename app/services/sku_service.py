@@ -1,12 +1,32 @@
-from asyncio import gather as asyncio_gather
+from asyncio import (
+    CancelledError, Semaphore, Task, TimeoutError as AsyncTimeoutError, create_task, gather as asyncio_gather, shield,
+    sleep as asyncio_sleep, wait as asyncio_wait, wait_for
+)
+from httpx import HTTPStatusError
+from math import log
+from random import random
 from redis.asyncio import Redis
 from typing import NamedTuple
-from time import time_ns
+from time import perf_counter, time, time_ns
 
 import app.schemas.vendor.models as models
 from app.core.constants import Constants
-from app.switch.switch import SwitchValues
-from app.services.cache_service import get_best_vendor_for_sku_from_redis, set_best_vendor_for_sku_in_redis
+from app.switch.switch import BatchParams, CacheRefreshParams, SwitchValues
+from app.services.cache_service import (
+    BestVendorEntry, fetch_key_for_best_vendor_lease_namespace, get_remaining_ttls_for_skus_from_redis, get_best_vendor_entry_for_sku_from_redis,
+    get_best_vendor_for_sku_from_redis, set_best_vendor_for_sku_in_redis,
+    get_best_vendors_for_skus_from_redis, set_best_vendors_for_skus_in_redis,
+    CachedOffer, get_vendor_offers_for_sku_from_redis, set_vendor_offers_for_sku_in_redis
+)
+from app.config.config import settings
+from app.instrumentation.metrics import (
+    BACKGROUND_REFRESHES, COALESCED_REQUESTS, HOT_SKU_HIT_RATIO, HOT_SKU_PREWARMS, HOT_SKU_TRAFFIC_SHARE, PARTIAL_DECISIONS, VENDOR_DEADLINE_MISSES
+)
+from app.instrumentation.tracing import span
+from app.resilience.deadline import Deadline, build_request_deadline
+from app.resilience.single_flight import SingleFlight, run_under_redis_lease
+from app.services.hot_skus import SpaceSavingTopK
+from app.services.sku_filter import add_unknown_sku, add_unknown_skus
 
 class InvalidResponseStructure(Exception):
     pass
@@ -19,9 +39,33 @@ class NormalizedParams(NamedTuple):
     price: float
     vendor_name: str
 
+# normalized params plus the vendor's own freshness timestamp (None if the vendor call failed)
+class VendorOffer(NamedTuple):
+    params: NormalizedParams
+    updated_at: int | None # in milliseconds
+
+class BestVendorDecision(NamedTuple):
+    vendor_name: str
+    is_partial: bool # True if some vendors missed the request deadline
+    has_answers: bool = True # False if none of them answered (nor had a cached offer), i.e. nothing to go on
+
 from app.external_clients.vendors import VendorClient
+from app.external_clients.registry import VENDOR_REGISTRY, VendorAdapter, fetch_vendor_adapter
+from app.external_clients.http_clients import VendorHTTPClients
 
 class SKUServiceHelper:
+    @staticmethod
+    def get_refresh_reason(entry: BestVendorEntry) -> str | None: # None => no refresh needed yet
+        now = time()
+        if now >= entry.soft_expires_at: # between soft and hard TTL, serve stale and refresh
+            return "stale"
+        # XFetch: refresh early with a probability that rises as the soft expiry nears,
+        # scaled by how long a refresh takes, so the refreshes of hot skus are spread out
+        # 1 - random() lies in (0, 1], keeps log() away from 0
+        if now - entry.compute_time * CacheRefreshParams.XFETCH_BETA * log(1 - random()) >= entry.soft_expires_at:
+            return "early"
+        return None
+
     @staticmethod
     def is_timestamp_fresh(timestamp: int) -> bool:
         if (time_ns() - timestamp * 1_000_000) > Constants.FRESHNESS_LIMIT * 1_000_000_000:
@@ -75,172 +119,322 @@ class SKUServiceHelper:
             return False
 
     @staticmethod
-    def normalize_response_for_vendorA(resp: models.GenericVendorResponse) -> NormalizedParams:
-        vname = Constants.VENDORA_NAME # vendor_name, declared as variable for easier reuse
+    def normalize_offer(adapter: VendorAdapter, resp: models.GenericVendorResponse) -> VendorOffer:
+        vname = adapter.name # vendor_name, declared as variable for easier reuse
 
         assert(resp.vendor_name == vname) # this will break if someone updates the code erroneously
 
         # default values
-        stockA: int = 0
-        priceA: float = 0
+        stock: int = 0
+        price: float = 0
 
         # Error is treated as stock=0, can modify it to do smth else if needed
         if resp.response_status == models.ResponseStatus.error: 
-            return NormalizedParams(stock=stockA, price=priceA, vendor_name=vname)
+            return VendorOffer(params=NormalizedParams(stock=stock, price=price, vendor_name=vname), updated_at=None)
         
-        # logic specific to the response structure of vendorA
-        # validate the response structure
+        # validate the response structure declared for this vendor
+        # raw bytes are parsed and validated in one pass by the precompiled validator, no intermediate dict
         try:
-            respA = models.VendorAResponse.model_validate(resp.response_body)
+            body = resp.response_body
+            if isinstance(body, (bytes, str)):
+                validated = adapter.schema.model_validate_json(body)
+            else:
+                validated = adapter.schema.model_validate(body)
         except Exception as e:
-            raise InvalidResponseStructure("Error validating the response body for vendorA: {}".format(e))
-
-        # timestamp validation comes first to avoid any further delays
-        if not SKUServiceHelper.is_timestamp_fresh(respA.last_updated): # stale date => discard
-            return NormalizedParams(stock=0, price=priceA, vendor_name=vname)
-        
-        # stock normalisation
-        if (respA.inventory == 0 and respA.product_in_stock): stockA = 5
-        # else stockA = 0 and that's already the default
-
-        # price validation
-        if SKUServiceHelper.validate_price(respA.price): # valid price, set it
-            priceA = respA.price
-        else: # discard it i.e. treat it as stock=0
-            return NormalizedParams(stock=0, price=priceA, vendor_name=vname)
-        
-        # return the normalized params
-        return NormalizedParams(stock=stockA, price=priceA, vendor_name=vname)
-    
-    @staticmethod
-    def normalize_response_for_vendorB(resp: models.GenericVendorResponse) -> NormalizedParams:
-        vname = Constants.VENDORB_NAME # vendor_name, declared as variable for easier reuse
-
-        assert(resp.vendor_name == vname) # this will break if someone updates the code erroneously
+            raise InvalidResponseStructure("Error validating the response body for {}: {}".format(vname, e))
 
-        # default values
-        stockB: int = 0
-        priceB: float = 0
-
-        # no retries implemented yet so stock treated as 0
-        if resp.response_status == models.ResponseStatus.error: 
-            return NormalizedParams(stock=stockB, price=priceB, vendor_name=vname)
-        
-        # logic specific to the response structure of vendorB
-        # validate the response structure
-        try:
-            respB = models.VendorBResponse.model_validate(resp.response_body)
-        except Exception as e:
-            raise InvalidResponseStructure("Error validating the response body for vendorB: {}".format(e))
+        # the registry's field mapping tells where each field lives in this vendor's response structure
+        mapping = adapter.mapping
+        updated_at = mapping.updated_at(validated)
 
         # timestamp validation comes first to avoid any further delays
-        if not SKUServiceHelper.is_timestamp_fresh(respB.last_refresh_time): # stale date => discard
-            return NormalizedParams(stock=0, price=priceB, vendor_name=vname)
+        if not SKUServiceHelper.is_timestamp_fresh(updated_at): # stale date => discard
+            return VendorOffer(params=NormalizedParams(stock=0, price=price, vendor_name=vname), updated_at=updated_at)
         
         # stock normalisation
-        if (respB.inventory.product_inventory == 0 and respB.inventory.stock_status == models.VendorBStockStatus.in_stock): stockB = 5
-        # else stockB = 0 and that's already the default
+        if (mapping.inventory(validated) == 0 and mapping.in_stock(validated)): stock = 5
+        # else stock = 0 and that's already the default
 
         # price validation
-        if SKUServiceHelper.validate_price(respB.cost): # valid price, set it
-            priceB = respB.cost
+        vendor_price = mapping.price(validated)
+        if SKUServiceHelper.validate_price(vendor_price): # valid price, set it
+            price = vendor_price
         else: # discard it i.e. treat it as stock=0
-            return NormalizedParams(stock=0, price=priceB, vendor_name=vname)
+            return VendorOffer(params=NormalizedParams(stock=0, price=price, vendor_name=vname), updated_at=updated_at)
         
         # return the normalized params
-        return NormalizedParams(stock=stockB, price=priceB, vendor_name=vname)
-    
-    @staticmethod
-    def normalize_response_for_vendorC(resp: models.GenericVendorResponse) -> NormalizedParams:
-        vname = Constants.VENDORC_NAME # vendor_name, declared as variable for easier reuse
-
-        assert(resp.vendor_name == vname) # this will break if someone updates the code erroneously
-
-        # default values
-        stockC: int = 0
-        priceC: float = 0
-
-        # no retries implemented yet so stock treated as 0
-        if resp.response_status == models.ResponseStatus.error: 
-            return NormalizedParams(stock=stockC, price=priceC, vendor_name=vname)
-        
-        # logic specific to the response structure of vendorC
-        # validate the response structure
-        try:
-            respC = models.VendorCResponse.model_validate(resp.response_body)
-        except Exception as e:
-            raise InvalidResponseStructure("Error validating the response body for vendorC: {}".format(e))
-
-        # timestamp validation comes first to avoid any further delays
-        if not SKUServiceHelper.is_timestamp_fresh(respC.details_updated_at): # stale date => discard
-            return NormalizedParams(stock=0, price=priceC, vendor_name=vname)
-        
-        # stock normalisation
-        if (respC.details.p_inventory == 0 and respC.details.p_stock == models.VendorCStockStatus.in_stock): stockC = 5
-        # else stockC = 0 and that's already the default
-
-        # price validation
-        if SKUServiceHelper.validate_price(respC.details.product_price): # valid price, set it
-            priceC = respC.details.product_price
-        else: # discard it i.e. treat it as stock=0
-            return NormalizedParams(stock=0, price=priceC, vendor_name=vname)
-        
-        # return the normalized params
-        return NormalizedParams(stock=stockC, price=priceC, vendor_name=vname)
+        return VendorOffer(params=NormalizedParams(stock=stock, price=price, vendor_name=vname), updated_at=updated_at)
 
     @staticmethod
-    def get_normalized_parameters(result: models.GenericVendorResponse) -> NormalizedParams: # return namedtuple of (stock, price, vendor_name)
-        match result.vendor_name: # if you add more vendors, then add the respective case here (one-time effort)
-            case Constants.VENDORA_NAME:
-                return SKUServiceHelper.normalize_response_for_vendorA(result)
-            case Constants.VENDORB_NAME:
-                return SKUServiceHelper.normalize_response_for_vendorB(result)
-            case Constants.VENDORC_NAME:
-                return SKUServiceHelper.normalize_response_for_vendorC(result)
-            case _:
-                raise InvalidVendorException("Vendor name doesn't exist!")
+    def get_offer_ttl_in_millis(updated_at: int) -> int: # <= 0 => not worth caching
+        # an offer is cacheable for as long as the vendor's own timestamp stays within FRESHNESS_LIMIT
+        remaining_freshness = Constants.FRESHNESS_LIMIT * 1000 - (time_ns() // 1_000_000 - updated_at)
+        return min(remaining_freshness, settings.offer_cache_ttl * 1000)
 
     @staticmethod
-    def get_best_vendor(result_tuple: tuple[models.GenericVendorResponse, ...]) -> str:
-        normalized_stock_price_list: list[NormalizedParams] = [] # list of (stock, price, vendor_name) tuples
-
-        # iterate
-        for result in result_tuple:
-            normalized_stock_price_list.append(SKUServiceHelper.get_normalized_parameters(result))
-        
-        # get best vendor from the stock_price list
-        return SKUServiceHelper.get_best_vendor_from_normalized_tuple_list(normalized_stock_price_list)
+    def get_normalized_offer(result: models.GenericVendorResponse) -> VendorOffer:
+        adapter = fetch_vendor_adapter(result.vendor_name) # new vendors only need to be registered (one-time effort)
+        if adapter is None:
+            raise InvalidVendorException("Vendor name doesn't exist!")
+        return SKUServiceHelper.normalize_offer(adapter, result)
 
 # the business logic resides here
 class SKUService:
     def __init__(self):
         self.vendor_client = VendorClient()
+        self.single_flight = SingleFlight() # coalesces concurrent cache misses per sku
+        self.background_tasks: set[Task] = set() # strong refs, so running refreshes aren't garbage collected
+        self.hot_skus = SpaceSavingTopK(settings.hot_sku_capacity) # most requested skus of this worker
 
-    async def get_best_vendor_for_sku(self, sku: str, redis_client: Redis) -> str:
+    async def get_best_vendor_for_sku(
+        self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, deadline: Deadline | None = None
+    ) -> str:
 
         # Step 1: Find best vendor in cache_service and return
         # Check Redis cache
-        best_vendor = await get_best_vendor_for_sku_from_redis(redis_client, sku)
-        if best_vendor:
+        entry = await get_best_vendor_entry_for_sku_from_redis(redis_client, sku)
+        if settings.hot_sku_tracking_enabled: self.hot_skus.record(sku, hit=entry is not None)
+        if entry:
             # print("Accessed cache")
-            return best_vendor
+            if SwitchValues.IS_STALE_WHILE_REVALIDATE_ENABLED:
+                refresh_reason = SKUServiceHelper.get_refresh_reason(entry)
+                if refresh_reason: self.refresh_in_background(sku, redis_client, http_clients, refresh_reason)
+            return entry.vendor_name
+
+        # Step 2: If not found, refresh it. Concurrent misses for the same sku share one refresh (and its deadline)
+        deadline = deadline or build_request_deadline()
+        if deadline.is_caller_supplied: # the caller's own budget is never imposed on the others
+            with span("refresh"):
+                decision = await self.refresh_within_caller_deadline(sku, redis_client, http_clients, deadline)
+            return decision.vendor_name
+        with span("refresh"): # includes the time spent waiting on a refresh run by another request
+            decision = await self.single_flight.do(
+                sku, lambda: self.refresh_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+            )
+        return decision.vendor_name
+
+    async def refresh_within_caller_deadline(
+        self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, deadline: Deadline
+    ) -> BestVendorDecision:
+        # follow a refresh already running for the sku, but no longer than the caller asked for
+        task = self.single_flight.in_flight.get(sku)
+        if task is not None:
+            COALESCED_REQUESTS.labels(scope="local").inc()
+            try:
+                return await wait_for(shield(task), timeout=deadline.remaining())
+            except AsyncTimeoutError: # nothing arrived in time, same as a fan-out where every vendor missed the deadline
+                return BestVendorDecision(
+                    vendor_name=Constants.BEST_VENDOR_SELECTION_OOS_MESSAGE, is_partial=True, has_answers=False
+                )
+
+        # nobody to follow: computed alone, so that a follower never inherits this shorter deadline
+        # (a partial decision made under it isn't cached, see fetch_and_cache_best_vendor_for_sku)
+        return await self.fetch_and_cache_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+
+    def refresh_in_background(self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, reason: str):
+        if sku in self.single_flight.in_flight: return # already being refreshed
+
+        BACKGROUND_REFRESHES.labels(reason=reason).inc()
+        deadline = build_request_deadline() # its own budget, not what's left of the request that triggered it
+        task = create_task(
+            self.single_flight.do(sku, lambda: self.refresh_best_vendor_for_sku(sku, redis_client, http_clients, deadline))
+        )
+        self.background_tasks.add(task)
+        task.add_done_callback(self.forget_background_task)
+
+    def forget_background_task(self, task: Task):
+        self.background_tasks.discard(task)
+        # a failed refresh just leaves the stale entry in place, retrieve the error so it isn't logged as unhandled
+        if not task.cancelled(): task.exception()
+
+    async def refresh_best_vendor_for_sku(
+        self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, deadline: Deadline
+    ) -> BestVendorDecision:
+        if not SwitchValues.IS_CROSS_WORKER_COALESCING_ENABLED:
+            return await self.fetch_and_cache_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+
+        # only one worker refreshes the key, the others take the value once it lands
+        async def read_cached() -> BestVendorDecision | None:
+            vendor_name = await get_best_vendor_for_sku_from_redis(redis_client, sku)
+            return BestVendorDecision(vendor_name=vendor_name, is_partial=False) if vendor_name else None
+
+        return await run_under_redis_lease(
+            redis_client,
+            f"{fetch_key_for_best_vendor_lease_namespace()}{sku}",
+            compute=lambda: self.fetch_and_cache_best_vendor_for_sku(sku, redis_client, http_clients, deadline),
+            read_cached=read_cached,
+            deadline=deadline
+        )
 
+    async def fetch_and_cache_best_vendor_for_sku(
+        self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, deadline: Deadline
+    ) -> BestVendorDecision:
+        started_at = perf_counter()
+        decision = await self.fetch_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+
+        # a partial decision only stands for everyone if it was made within our own budget and on some answers,
+        # otherwise any caller could make the others see OUT_OF_STOCK (eg: X-Request-Deadline-Ms: 1)
+        if decision.is_partial and (deadline.is_caller_supplied or not decision.has_answers):
+            return decision
+
+        # Store in Redis cache, the refresh time feeds the early refresh
+        # a decision made on partial data is only kept briefly, so that it's soon redone with all the vendors
+        ttl = settings.partial_result_cache_ttl if decision.is_partial else settings.cache_ttl
+        await set_best_vendor_for_sku_in_redis(
+            redis_client, sku, decision.vendor_name, compute_time=perf_counter() - started_at, ttl=ttl
+        )
+        if decision.vendor_name == Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE:
+            await add_unknown_sku(redis_client, sku)
+
+        return decision
+
+    async def fetch_best_vendor_for_sku(
+        self, sku: str, redis_client: Redis, http_clients: VendorHTTPClients, deadline: Deadline
+    ) -> BestVendorDecision:
         # this block is now more generic after introducing "Any" type for the "response_body" field
         # so no extra code changes required (unlike before) if the order of vendors is altered or new
         # vendors added
 
-        # Step 2: If not found fetch via API call
-        results = await asyncio_gather(
-            self.vendor_client.call_vendorA(sku, redis_client), 
-            self.vendor_client.call_vendorB(sku, redis_client),
-            self.vendor_client.call_vendorC(sku, redis_client),
-            # return_exceptions=True, # to run all tasks to completion, even if some raise exceptions 
+        # offers of the vendors that are still fresh in the cache are reused, only the others are fetched
+        cached_offers: dict[str, CachedOffer | None] = {}
+        if SwitchValues.IS_VENDOR_OFFER_CACHE_ENABLED:
+            cached_offers = await get_vendor_offers_for_sku_from_redis(redis_client, sku, list(VENDOR_REGISTRY))
+        normalized: dict[str, NormalizedParams] = {
+            vendor_name: NormalizedParams(stock=offer.stock, price=offer.price, vendor_name=vendor_name)
+            for vendor_name, offer in cached_offers.items()
+            if offer and SKUServiceHelper.is_timestamp_fresh(offer.updated_at)
+        }
+
+        # fetch via API call, one call per missing vendor (each capped by its own concurrency limit)
+        calls = {
+            vendor_name: create_task(
+                self.vendor_client.call_vendor(adapter, sku, redis_client, http_clients[vendor_name], deadline)
+            )
+            for vendor_name, adapter in VENDOR_REGISTRY.items() if vendor_name not in normalized
+        }
+
+        # wait no longer than the request deadline, then go ahead with whatever has arrived
+        pending = set()
+        if calls:
+            with span("vendor_fanout"):
+                _, pending = await asyncio_wait(calls.values(), timeout=deadline.remaining())
+        for task in pending: task.cancel()
+
+        offers_to_cache: dict[str, tuple[CachedOffer, int]] = {} # vendor_name -> (offer, ttl in millis)
+        not_found = 0 # vendors that answered 404 for the sku
+        for vendor_name, task in calls.items():
+            if task in pending: # treated like any other vendor error i.e. stock = 0
+                VENDOR_DEADLINE_MISSES.labels(vendor=vendor_name).inc()
+                result = models.GenericVendorResponse(
+                    vendor_name=vendor_name,
+                    response_status=models.ResponseStatus.error,
+                    response_body=TimeoutError("Request deadline exceeded")
+                )
+            else:
+                result = task.result()
+                if isinstance(result.response_body, HTTPStatusError) and result.response_body.response.status_code == 404:
+                    not_found += 1
+
+            with span("normalize"):
+                offer = SKUServiceHelper.get_normalized_offer(result)
+            normalized[vendor_name] = offer.params
+            if offer.updated_at is not None: # errors aren't cached, they're retried on the next miss
+                ttl = SKUServiceHelper.get_offer_ttl_in_millis(offer.updated_at)
+                if ttl > 0:
+                    offers_to_cache[vendor_name] = (
+                        CachedOffer(stock=offer.params.stock, price=offer.params.price, updated_at=offer.updated_at), ttl
+                    )
+        if pending: PARTIAL_DECISIONS.inc()
+
+        if SwitchValues.IS_VENDOR_OFFER_CACHE_ENABLED:
+            await set_vendor_offers_for_sku_in_redis(redis_client, sku, offers_to_cache)
+
+        # nobody knows the sku (a cached offer means the vendor does), negatively cached and reported as a 404
+        if not_found == len(VENDOR_REGISTRY):
+            return BestVendorDecision(vendor_name=Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE, is_partial=False)
+
+        # the business logic to apply over the normalized offers, in registry order (ties are broken by position)
+        best_vendor = SKUServiceHelper.get_best_vendor_from_normalized_tuple_list(
+            [normalized[vendor_name] for vendor_name in VENDOR_REGISTRY]
+        )
+        return BestVendorDecision(
+            vendor_name=best_vendor, is_partial=bool(pending), has_answers=len(pending) < len(VENDOR_REGISTRY)
         )
 
-        # the business logic to apply over the results[] tuple
-        best_vendor = SKUServiceHelper.get_best_vendor(results)
-
-        # Store in Redis cache with default ttl
-        await set_best_vendor_for_sku_in_redis(redis_client, sku, best_vendor)
-
-        return best_vendor
+    async def get_best_vendors_for_skus(
+        self, skus: list[str], redis_client: Redis, http_clients: VendorHTTPClients
+    ) -> tuple[dict[str, str], dict[str, str]]: # (sku -> best vendor, sku -> error message)
+        skus = list(dict.fromkeys(skus)) # drop duplicates, keep the order
+        started_at = perf_counter()
+
+        # Step 1: all the cache hits in one MGET
+        cached = await get_best_vendors_for_skus_from_redis(redis_client, skus)
+        best_vendors = {sku: vendor_name for sku, vendor_name in cached.items() if vendor_name}
+        misses = [sku for sku in skus if sku not in best_vendors]
+        if settings.hot_sku_tracking_enabled:
+            for sku in skus: self.hot_skus.record(sku, hit=sku in best_vendors)
+
+        # Step 2: fan out to the vendors only for the misses, with bounded concurrency
+        semaphore = Semaphore(BatchParams.MAX_CONCURRENT_SKU_FETCHES)
+        async def fetch(sku: str) -> BestVendorDecision:
+            async with semaphore: # still coalesced with any single-sku refresh running for the same sku
+                deadline = build_request_deadline() # per sku, starts once it gets its turn
+                return await self.single_flight.do(
+                    sku, lambda: self.fetch_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+                )
+
+        results = await asyncio_gather(*(fetch(sku) for sku in misses), return_exceptions=True)
+
+        fetched: dict[str, str] = {}
+        errors: dict[str, str] = {}
+        for sku, result in zip(misses, results):
+            if isinstance(result, BaseException): # eg: InvalidResponseStructure, reported per sku
+                errors[sku] = f"{type(result).__name__}: {result}"
+            else:
+                best_vendors[sku] = result.vendor_name
+                if not result.is_partial: fetched[sku] = result.vendor_name # partial decisions aren't cached
+
+        # Step 3: write all the fetched results back in one pipeline
+        await set_best_vendors_for_skus_in_redis(redis_client, fetched, compute_time=perf_counter() - started_at)
+
+        # unknown skus are reported as errors, whether fetched just now or negatively cached
+        unknown_skus = [sku for sku, vendor_name in best_vendors.items()
+                        if vendor_name == Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE]
+        for sku in unknown_skus:
+            del best_vendors[sku]
+            errors[sku] = "Unknown sku"
+        # the newly found ones go into the filter in one pipeline
+        await add_unknown_skus(redis_client, [sku for sku in unknown_skus if sku in fetched])
+
+        return best_vendors, errors
+
+    async def run_hot_sku_maintenance(self, redis_client: Redis, http_clients: VendorHTTPClients):
+        # long-running task started in app_lifespan: publishes the top-K metrics and, if enabled,
+        # refreshes the top-K skus whose cache entries are about to expire (or already gone)
+        semaphore = Semaphore(BatchParams.MAX_CONCURRENT_SKU_FETCHES)
+        async def prewarm(sku: str):
+            async with semaphore: # shares the refresh with any request for the same sku
+                deadline = build_request_deadline()
+                await self.single_flight.do(
+                    sku, lambda: self.refresh_best_vendor_for_sku(sku, redis_client, http_clients, deadline)
+                )
+
+        while True:
+            await asyncio_sleep(settings.hot_sku_maintenance_interval)
+            try:
+                share, hit_ratio = self.hot_skus.top_k_stats(settings.hot_sku_top_k)
+                HOT_SKU_TRAFFIC_SHARE.set(share)
+                HOT_SKU_HIT_RATIO.set(hit_ratio)
+                if not settings.hot_sku_prewarm_enabled: continue
+
+                top_skus = [hot.sku for hot in self.hot_skus.top(settings.hot_sku_top_k)]
+                # negative entries are short lived on purpose, they're redone by the traffic rather than kept warm
+                ttls = await get_remaining_ttls_for_skus_from_redis(redis_client, top_skus, include_negative=False)
+                expiring = [sku for sku, ttl in ttls.items() if ttl is None or ttl < settings.hot_sku_prewarm_margin]
+                results = await asyncio_gather(*(prewarm(sku) for sku in expiring), return_exceptions=True)
+                for result in results:
+                    HOT_SKU_PREWARMS.labels(result="failed" if isinstance(result, BaseException) else "refreshed").inc()
+            except CancelledError:
+                raise
+            except Exception:
+                pass # Redis hiccup, try again on the next round
@@ -0,0 +1,140 @@
+'''
+Catalog warm-up: computes the best vendor of a list of skus ahead of the traffic, so that a deploy or a
+Redis flush doesn't send the first wave of requests to all the vendors at once. The vendor calls are
+paced to a share of the vendors' rate limits (live traffic keeps the rest) and the results are written
+back in pipelined chunks.
+
+Runs in the background of app_lifespan (WARMUP_ON_STARTUP, one worker at a time) or from the command line:
+
+    python -m app.services.warmup --file skus.txt
+    python -m app.services.warmup --redis-set catalog:skus
+'''
+import argparse
+import asyncio
+import json
+from asyncio import Semaphore, create_task, gather as asyncio_gather, sleep as asyncio_sleep
+from time import monotonic
+from redis.asyncio import Redis
+
+from app.config.config import settings
+from app.core.constants import Constants
+from app.external_clients.http_clients import VendorHTTPClients
+from app.external_clients.registry import VENDOR_REGISTRY
+from app.instrumentation.metrics import WARMUP_PROGRESS, WARMUP_SKUS, WARMUP_THROUGHPUT
+from app.resilience.deadline import build_request_deadline
+from app.services.cache_service import get_best_vendors_for_skus_from_redis, set_best_vendors_for_skus_in_redis
+from app.services.sku_filter import add_unknown_sku
+from app.services.sku_service import SKUService
+from app.switch.switch import BatchParams
+
+def fetch_key_for_warmup_lock() -> str:
+    return "lock:warmup"
+
+def load_skus_from_file(path: str) -> list[str]:
+    # one sku per line, blank lines and "#" comments are skipped
+    with open(path) as file:
+        skus = [line.strip() for line in file]
+    return list(dict.fromkeys(sku for sku in skus if sku and not sku.startswith("#")))
+
+async def load_skus_from_redis_set(redis: Redis, key: str) -> list[str]:
+    return [sku async for sku in redis.sscan_iter(key, count=1_000)] # SSCAN, doesn't block Redis like SMEMBERS
+
+def fetch_warmup_rate() -> float: # skus per second
+    # every sku costs one call per vendor, so the vendor with the tightest limit sets the pace
+    rate = min(
+        adapter.rate_limit.request_limit * 1000 / adapter.rate_limit.window_in_millis for adapter in VENDOR_REGISTRY.values()
+    )
+    return rate * settings.warmup_rate_limit_share
+
+async def warm_up(skus: list[str], redis_client: Redis, http_clients: VendorHTTPClients, sku_service: SKUService) -> dict:
+    rate = fetch_warmup_rate()
+    semaphore = Semaphore(BatchParams.MAX_CONCURRENT_SKU_FETCHES)
+    results = {"warmed": 0, "skipped": 0, "partial": 0, "failed": 0}
+    started_at = monotonic()
+    next_start = started_at
+
+    async def warm(sku: str) -> str | None:
+        try:
+            decision = await sku_service.fetch_best_vendor_for_sku(sku, redis_client, http_clients, build_request_deadline())
+        finally:
+            semaphore.release()
+        return None if decision.is_partial else decision.vendor_name # partial decisions aren't worth caching
+
+    WARMUP_PROGRESS.set(0)
+    for offset in range(0, len(skus), settings.warmup_chunk_size):
+        chunk = skus[offset:offset + settings.warmup_chunk_size]
+
+        # already cached skus (eg: a restart without a flush) cost nothing
+        cached = await get_best_vendors_for_skus_from_redis(redis_client, chunk)
+        misses = [sku for sku in chunk if not cached[sku]]
+        results["skipped"] += len(chunk) - len(misses)
+        WARMUP_SKUS.labels(result="skipped").inc(len(chunk) - len(misses))
+
+        tasks = []
+        for sku in misses:
+            await semaphore.acquire()
+            delay = next_start - monotonic()
+            if delay > 0: await asyncio_sleep(delay)
+            next_start = max(next_start, monotonic()) + 1 / rate # no catching up in a burst after a stall
+            tasks.append(create_task(warm(sku)))
+
+        best_vendors: dict[str, str] = {}
+        for sku, result in zip(misses, await asyncio_gather(*tasks, return_exceptions=True)):
+            outcome = "failed" if isinstance(result, BaseException) else "partial" if result is None else "warmed"
+            results[outcome] += 1
+            WARMUP_SKUS.labels(result=outcome).inc()
+            if outcome == "warmed": best_vendors[sku] = result
+
+        # one pipeline per chunk
+        await set_best_vendors_for_skus_in_redis(redis_client, best_vendors)
+        for sku, vendor_name in best_vendors.items():
+            if vendor_name == Constants.BEST_VENDOR_SELECTION_UNKNOWN_SKU_MESSAGE: await add_unknown_sku(redis_client, sku)
+
+        done = offset + len(chunk)
+        WARMUP_PROGRESS.set(done / len(skus))
+        WARMUP_THROUGHPUT.set(done / max(monotonic() - started_at, 1e-9))
+
+    return {**results, "skus": len(skus), "seconds": round(monotonic() - started_at, 3), "rate_limit_in_skus_per_second": rate}
+
+async def load_skus(redis_client: Redis, file: str | None, redis_set: str | None) -> list[str]:
+    skus = load_skus_from_file(file) if file else []
+    if redis_set: skus = list(dict.fromkeys(skus + await load_skus_from_redis_set(redis_client, redis_set)))
+    return skus
+
+async def run_startup_warmup(redis_client: Redis, http_clients: VendorHTTPClients, sku_service: SKUService):
+    # background task started in app_lifespan; with several workers (or pods) only the one holding the lock runs it
+    lock_key = fetch_key_for_warmup_lock()
+    if not await redis_client.set(lock_key, "1", nx=True, ex=settings.warmup_lock_ttl): return
+    try:
+        skus = await load_skus(redis_client, settings.warmup_sku_file, settings.warmup_redis_set)
+        await warm_up(skus, redis_client, http_clients, sku_service)
+    finally:
+        await redis_client.delete(lock_key)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Warm up the best vendor cache for a list of skus")
+    parser.add_argument("--file", help="one sku per line")
+    parser.add_argument("--redis-set", help="Redis set holding the skus")
+    args = parser.parse_args()
+    if not args.file and not args.redis_set: parser.error("--file and/or --redis-set is required")
+    return args
+
+async def run(args: argparse.Namespace) -> dict:
+    # project-file imports, only needed standalone
+    from app.core.lifespan_events import build_redis_client
+    from app.external_clients.http_clients import build_vendor_http_clients, close_vendor_http_clients
+
+    redis_client = build_redis_client()
+    http_clients = build_vendor_http_clients()
+    try:
+        skus = await load_skus(redis_client, args.file, args.redis_set)
+        return await warm_up(skus, redis_client, http_clients, SKUService())
+    finally:
+        await close_vendor_http_clients(http_clients)
+        await redis_client.aclose()
+
+def main():
+    print(json.dumps(asyncio.run(run(parse_args())), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,83 @@ class SwitchValues:
     # one realises that it doesn't matter since this variable is only due to
     # the simulation/mocking requirement in this task. It doesn't arise in a
     # real-life production codebase.
-    IS_MOCKING_VIA_FILE: bool = True 
+    IS_SIMULATED_VENDORS_ENABLED: bool = True # vendors answered in memory by simulation/transports.py
     IS_PRICE_STOCK_RULE_UPGRADE_ENABLED: bool = True
     RATE_LIMIT_FOR_VENDORS_ENABLED: bool = True
+    IS_CROSS_WORKER_COALESCING_ENABLED: bool = False # in-process coalescing is always on
+    IS_STALE_WHILE_REVALIDATE_ENABLED: bool = True
+    IS_VENDOR_OFFER_CACHE_ENABLED: bool = True # only missing/stale vendor offers are refetched on a miss
+    IS_RATE_LIMIT_TOKEN_LEASING_ENABLED: bool = False # lease tokens in batches instead of one Redis call per vendor call
 
 # ideally put in a switch microservice outside this codebase
 # so that it can be swiftly altered in emergency scenarios saving
 # the time needed to push new code just for modifying these values and then redeploying it
 class CircuitBreakerParams:
+    # defaults for every vendor
+    DEFAULT_CB_MAX_FAIL = 5 # after these many consecutive failures, open the circuit
+    DEFAULT_CB_OPEN_DURATION = 30 # in seconds
+
     # params for vendorC
     VENDORC_CB_MAX_FAIL = 3 # after these many failures, open the circuit
     VENDORC_CB_OPEN_DURATION = 30 # in seconds
 
+    # the state is shared via Redis, each worker re-reads it at most this often
+    SNAPSHOT_TTL_IN_MILLIS = 1000
+    # a half-open trial call that never reports back frees its slot after this
+    HALF_OPEN_TRIAL_LEASE_IN_MILLIS = 5000
+
+# in-flight calls per vendor and worker, adapted to the vendor's latency, calls beyond the limit are shed
+class VendorConcurrencyParams:
+    DEFAULT_MAX_CONCURRENT_CALLS = 32 # upper bound of the adaptive limit
+    MIN_CONCURRENT_CALLS = 2 # lower bound, so a recovering vendor still gets probed
+    INITIAL_CONCURRENT_CALLS = 10
+    BACKOFF_RATIO = 0.9 # the limit is multiplied by this on a dropped or slow call
+    LATENCY_TOLERANCE = 2.0 # a call is slow beyond these many times the baseline latency
+    BASELINE_SMOOTHING = 0.05 # weight of a new sample in the baseline latency
+
 # all ratelimit related flags here
 class RateLimitParams:
     GLOBAL_WINDOW_IN_MILLIS = 60_000 # in millis
     GLOBAL_REQUEST_LIMIT = 60 # per window
+    LEASE_SIZE = 5 # tokens leased by a worker per Redis call, keep it small compared to the limit
+    LEASE_DURATION_IN_MILLIS = 1_000 # unspent leased tokens are dropped after this
+
+# retries of vendor calls
+class RetryParams:
+    MAX_RETRIES = 2 # on top of the first attempt
+    BASE_DELAY_IN_MILLIS = 100 # exponential backoff with full jitter starting here ...
+    MAX_DELAY_IN_MILLIS = 1_000 # ... and capped here (a Retry-After from the vendor wins over both)
+    BUDGET_CAPACITY = 10 # retry tokens per vendor and worker
+    BUDGET_REFILL_PER_SECOND = 1.0
+
+# request coalescing (single-flight) across workers
+class CoalescingParams:
+    LEASE_DURATION_IN_MILLIS = 5_000 # should cover one full vendor fan-out
+    POLL_INTERVAL_IN_MILLIS = 50 # how often the waiting workers check for the value
+
+# background refresh of best-vendor entries
+class CacheRefreshParams:
+    XFETCH_BETA = 1.0 # > 1 favours earlier refreshes, < 1 later ones
+
+# batch lookup endpoint
+class BatchParams:
+    MAX_SKUS_PER_BATCH = 500 # per request
+    MAX_CONCURRENT_SKU_FETCHES = 10 # cache misses fanned out to the vendors at the same time
+
+# behaviour of the simulated vendors, only used when IS_SIMULATED_VENDORS_ENABLED
+class SimulationParams:
+    VENDORA_LATENCY_IN_MILLIS = (20, 80) # (min, max)
+    VENDORA_ERROR_RATE = 0.0
+    VENDORA_STALE_RATIO = 0.5
+
+    VENDORB_LATENCY_IN_MILLIS = (20, 80)
+    VENDORB_ERROR_RATE = 0.0
+    VENDORB_STALE_RATIO = 0.5
+
+    # vendorC is known for slow responses & errors
+    VENDORC_LATENCY_IN_MILLIS = (20, 1_000)
+    VENDORC_ERROR_RATE = 0.33
+    VENDORC_STALE_RATIO = 0.5
 
 # as the name suggests, can be moved to a private vault in production env
 # this is mere simulation
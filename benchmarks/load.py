@@ -0,0 +1,167 @@
+'''
+Load test & latency benchmark for GET /products/{sku}.
+
+Runs the app in-process (ASGI transport, full lifespan) against the simulated vendors
+and either a local Redis (settings.redis_host/port) or an in-memory fake of it, then
+prints a JSON report that can be compared across commits.
+
+    python -m benchmarks.load --rps 200 --duration 30 --concurrency 64 --skus 10000 --distribution zipf
+    python -m benchmarks.load --redis fake --output bench.json
+
+The fake needs `pip install "fakeredis[lua]"` (Lua for the rate limiter script).
+'''
+# library imports
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from itertools import accumulate
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+
+# project-file imports
+from app.switch import switch
+from app.main import app
+from app.external_clients.http_clients import fetch_timeout_per_vendor
+import app.core.lifespan_events as lifespan_events
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test GET /products/{sku} in-process")
+    parser.add_argument("--rps", type=float, default=100.0, help="target request rate (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="in seconds")
+    parser.add_argument("--concurrency", type=int, default=32, help="max in-flight requests")
+    parser.add_argument("--skus", type=int, default=1_000, help="size of the sku space")
+    parser.add_argument("--distribution", choices=["uniform", "zipf"], default="zipf")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="zipf exponent, higher => fewer hot skus")
+    parser.add_argument("--redis", choices=["local", "fake"], default="fake")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the vendor rate limiter")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    return parser.parse_args()
+
+# sku picker for the chosen popularity distribution
+def build_sku_picker(args: argparse.Namespace):
+    skus = [f"sku{idx:07d}" for idx in range(args.skus)] # passes validate_sku
+    if args.distribution == "uniform":
+        return lambda: random.choice(skus)
+    cum_weights = list(accumulate(1 / (rank ** args.zipf_s) for rank in range(1, args.skus + 1)))
+    return lambda: random.choices(skus, cum_weights=cum_weights)[0]
+
+def sum_samples(name: str, **labels: str) -> float:
+    # sum of all samples of a metric in the default registry matching the given labels
+    total = 0.0
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                total += sample.value
+    return total
+
+def snapshot_counters() -> dict[str, float]:
+    snapshot = {
+        "l1_hits": sum_samples("cache_lookups_total", tier="l1", result="hit"),
+        "redis_hits": sum_samples("cache_lookups_total", tier="redis", result="hit"),
+        "redis_misses": sum_samples("cache_lookups_total", tier="redis", result="miss"),
+        "negative_hits": sum_samples("cache_lookups_total", tier="negative", result="hit"), # part of redis_hits
+        "rate_limit_rejections": sum_samples("rate_limit_decisions_total", allowed="False"),
+    }
+    for vendor_name in fetch_timeout_per_vendor():
+        snapshot[f"vendor_calls:{vendor_name}"] = sum_samples("vendor_latency_seconds_count", vendor=vendor_name)
+    return snapshot
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values: return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)) # nearest rank
+    return sorted_values[rank]
+
+def fetch_git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+async def run(args: argparse.Namespace) -> dict:
+    # always the local stand-in vendors, never the real ones (switches are read at call time)
+    switch.SwitchValues.IS_SIMULATED_VENDORS_ENABLED = True
+    if args.no_rate_limit:
+        switch.SwitchValues.RATE_LIMIT_FOR_VENDORS_ENABLED = False
+    if args.redis == "fake":
+        from fakeredis import FakeAsyncRedis
+        lifespan_events.build_redis_client = lambda: FakeAsyncRedis(decode_responses=True)
+
+    random.seed(args.seed)
+    pick_sku = build_sku_picker(args)
+
+    latencies: list[float] = []
+    status_codes: dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            before = snapshot_counters()
+
+            async def fire(scheduled_at: float):
+                async with semaphore:
+                    try:
+                        resp = await client.get(f"/products/{pick_sku()}")
+                        status = str(resp.status_code)
+                    except Exception as e:
+                        status = type(e).__name__
+                # measured from the scheduled send time, so queueing behind the concurrency cap counts too
+                latencies.append(time.perf_counter() - scheduled_at)
+                status_codes[status] = status_codes.get(status, 0) + 1
+
+            # open loop: requests are sent on schedule whether or not the earlier ones have finished
+            total = int(args.rps * args.duration)
+            started_at = time.perf_counter()
+            tasks = []
+            for idx in range(total):
+                scheduled_at = started_at + idx / args.rps
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0: await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(fire(scheduled_at)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started_at
+
+            after = snapshot_counters()
+
+    delta = {key: after[key] - before[key] for key in after}
+    hits = delta["l1_hits"] + delta["redis_hits"]
+    lookups = hits + delta["redis_misses"]
+    latencies.sort()
+
+    return {
+        "git_commit": fetch_git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "requests": len(latencies),
+        "status_codes": status_codes,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "cache": {
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "l1_hits": delta["l1_hits"],
+            "redis_hits": delta["redis_hits"],
+            "negative_hits": delta["negative_hits"],
+            "misses": delta["redis_misses"],
+        },
+        "vendor_calls": {key.split(":", 1)[1]: value for key, value in delta.items() if key.startswith("vendor_calls:")},
+        "rate_limit_rejections": delta["rate_limit_rejections"],
+    }
+
+def main():
+    args = parse_args()
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+'''
+Redis memory benchmark of the best vendor cache: the string layout (one `sku:<sku>` key per sku)
+against the compact layout (skus bucketed into small hashes, packed integer values, per-field TTLs).
+
+Writes N synthetic entries per layout with the same encoders as app/services/cache_service.py into a
+scratch database of a real Redis (>= 7.4 for HEXPIRE), reads `used_memory` before and after, then
+flushes that database. Prints a JSON report.
+
+The compact layout is measured with settings.compact_cache_buckets (COMPACT_CACHE_BUCKETS), i.e. what production
+gets, and additionally with skus / --skus-per-bucket buckets if given. Each run reports the fullest bucket against
+the server's hash-max-listpack-entries: beyond it that bucket is hashtable-encoded and the saving is lost.
+
+    python -m benchmarks.redis_memory --skus 1000000 10000000 --db 15
+
+10M string keys need about 1 GB of Redis memory.
+'''
+# library imports
+import argparse
+import asyncio
+import json
+import random
+from time import time
+from zlib import crc32
+from redis.asyncio import Redis
+
+# project-file imports
+from app.config.config import settings
+from app.external_clients.registry import CACHE_VENDOR_NAMES
+from app.services.cache_service import (
+    BestVendorEntry, encode_best_vendor_entry, encode_compact_entry,
+    fetch_key_for_best_vendor_bucket_namespace, fetch_key_for_best_vendor_namespace
+)
+
+BATCH_SIZE = 10_000 # entries per pipeline
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare the Redis memory of the cache layouts")
+    parser.add_argument("--skus", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--db", type=int, default=15, help="scratch database, flushed before and after each run")
+    parser.add_argument(
+        "--skus-per-bucket", type=int, help="also measure skus / N buckets, keep under hash-max-listpack-entries (128)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def build_entry(rng: random.Random) -> BestVendorEntry:
+    return BestVendorEntry(
+        vendor_name=rng.choice(CACHE_VENDOR_NAMES),
+        soft_expires_at=time() + settings.cache_soft_ttl,
+        compute_time=rng.uniform(0.02, 1.0)
+    )
+
+async def fill_string_layout(redis: Redis, skus: int, rng: random.Random):
+    key_namespace = fetch_key_for_best_vendor_namespace()
+    for start in range(0, skus, BATCH_SIZE):
+        async with redis.pipeline(transaction=False) as pipe:
+            for idx in range(start, min(start + BATCH_SIZE, skus)):
+                pipe.set(f"{key_namespace}SKU{idx:010d}", encode_best_vendor_entry(build_entry(rng)), ex=settings.cache_ttl)
+            await pipe.execute()
+
+async def fill_compact_layout(redis: Redis, skus: int, buckets: int, rng: random.Random, fields_per_bucket: dict[str, int]):
+    bucket_namespace = fetch_key_for_best_vendor_bucket_namespace()
+    for start in range(0, skus, BATCH_SIZE):
+        per_bucket: dict[str, dict[str, int]] = {}
+        for idx in range(start, min(start + BATCH_SIZE, skus)):
+            sku = f"SKU{idx:010d}"
+            bucket_key = f"{bucket_namespace}{crc32(sku.encode()) % buckets}"
+            per_bucket.setdefault(bucket_key, {})[sku] = encode_compact_entry(build_entry(rng))
+            fields_per_bucket[bucket_key] = fields_per_bucket.get(bucket_key, 0) + 1
+        async with redis.pipeline(transaction=False) as pipe:
+            for bucket_key, fields in per_bucket.items():
+                pipe.hset(bucket_key, mapping=fields)
+                pipe.hexpire(bucket_key, settings.cache_ttl, *fields)
+            await pipe.execute()
+
+async def measure(redis: Redis, fill) -> tuple[int, str | None]:
+    await redis.flushdb()
+    before = (await redis.info("memory"))["used_memory"]
+    await fill()
+    after = (await redis.info("memory"))["used_memory"]
+    sample = await redis.randomkey()
+    encoding = await redis.object("encoding", sample) if sample else None
+    await redis.flushdb()
+    return after - before, encoding
+
+async def measure_compact_layout(redis: Redis, skus: int, buckets: int, seed: int, listpack_limit: int, string_bytes: int) -> dict:
+    fields_per_bucket: dict[str, int] = {}
+    compact_bytes, compact_encoding = await measure(
+        redis, lambda: fill_compact_layout(redis, skus, buckets, random.Random(seed), fields_per_bucket)
+    )
+    max_fields = max(fields_per_bucket.values(), default=0)
+    return {
+        "used_memory": compact_bytes, "bytes_per_sku": round(compact_bytes / skus, 1),
+        "encoding": compact_encoding, "buckets": buckets, "max_skus_per_bucket": max_fields,
+        "within_listpack_limit": max_fields <= listpack_limit,
+        "saving_ratio": round(1 - compact_bytes / string_bytes, 3) if string_bytes else None,
+    }
+
+async def run(args: argparse.Namespace) -> dict:
+    redis = Redis(host=settings.redis_host, port=settings.redis_port, db=args.db, decode_responses=True)
+    report = {}
+    try:
+        listpack_limit = int((await redis.config_get("hash-max-listpack-entries"))["hash-max-listpack-entries"])
+        for skus in args.skus:
+            string_bytes, string_encoding = await measure(
+                redis, lambda: fill_string_layout(redis, skus, random.Random(args.seed))
+            )
+            report[str(skus)] = {
+                "string": {"used_memory": string_bytes, "bytes_per_sku": round(string_bytes / skus, 1), "encoding": string_encoding},
+                # the bucket count production runs with
+                "compact": await measure_compact_layout(
+                    redis, skus, settings.compact_cache_buckets, args.seed, listpack_limit, string_bytes
+                ),
+            }
+            if args.skus_per_bucket:
+                report[str(skus)]["compact_sized"] = await measure_compact_layout(
+                    redis, skus, max(1, skus // args.skus_per_bucket), args.seed, listpack_limit, string_bytes
+                )
+    finally:
+        await redis.aclose()
+    return report
+
+def main():
+    print(json.dumps(asyncio.run(run(parse_args())), indent=2))
+
+if __name__ == "__main__":
+    main()
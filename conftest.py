@@ -0,0 +1 @@
+# marks the repository root for pytest, which puts it on sys.path so that `pytest` finds the app package
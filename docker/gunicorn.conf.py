@@ -0,0 +1,26 @@
+# production serving: gunicorn manages the worker processes, each one runs the app on uvicorn (uvloop + httptools)
+# gunicorn -c docker/gunicorn.conf.py app.main:app
+import os
+import shutil
+from multiprocessing import cpu_count
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", cpu_count())) # all the cores of the pod by default
+worker_class = "uvicorn_worker.UvicornWorker" # picks uvloop and httptools when installed (uvicorn[standard])
+keepalive = 5 # in seconds, a bit longer than a typical load balancer's idle probe
+graceful_timeout = 30 # in seconds, time for the lifespan shutdown (closing clients, background tasks)
+accesslog = "-"
+
+# prometheus_client multiprocess mode: every worker writes its samples to files in this directory,
+# /metrics merges them (see app/main.py). The variable has to be set before prometheus_client is imported.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+def on_starting(server):
+    # files left over by a previous run would be merged into the new numbers
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+
+def child_exit(server, worker):
+    # drops the live gauges of the dead worker, its counters and histograms keep being reported
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
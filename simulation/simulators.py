@@ -5,7 +5,6 @@ import app.core.constants as constants
 # library imports
 import random
 from string import ascii_letters, digits, punctuation
-from jsonpickle import encode
 from time import time_ns
 
 # all helper functions under this class
@@ -16,15 +15,9 @@ class HelperFuncs:
         return "".join(random.choices(charset, k=length))
     
     @staticmethod
-    def gen_case_for_vendorC() -> models.CaseForVendorC:
-        return random.choice([models.CaseForVendorC.slow,
-                              models.CaseForVendorC.fail,
-                              models.CaseForVendorC.okay])
-    
-    @staticmethod
-    def set_timestamp_in_millis() -> int: # return timestamp in millis
-        # should the timestamp be less than 10m old?
-        fresh = random.randint(0, 1)
+    def set_timestamp_in_millis(stale_ratio: float = 0.5) -> int: # return timestamp in millis
+        # should the timestamp be less than 10m old? stale with probability stale_ratio
+        fresh = random.random() >= stale_ratio
         if fresh: # assuming limit is more than 10s
             return (time_ns() - random.randint(0, (constants.Constants.FRESHNESS_LIMIT - 10) * 1_000_000_000)) // 1_000_000 # subtracted 10 to avoid edge-cases
         else: # old timestamp
@@ -45,206 +38,149 @@ class Constants:
 
 # simulator for vendorA
 class SimulatorA:
-    # declare respA with filler values to have a valid definition
-    respA: models.VendorAResponse = models.VendorAResponse(
-        product_id="",
-        product_name="",
-        price=0,
-        inventory=None,
-        product_in_stock=False,
-        last_updated=0
-    )
-    # file path for external access
-    mock_file_path: str = "./simulated_responses/vendorA_resp.json"
-
-    def __init__(self, sku: str):
-        # set sku
-        self.respA.product_id = sku
-        # set product name
-        self.respA.product_name = HelperFuncs.gen_rand_string(
-            random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
-            Constants.CHARSET
+    def __init__(self, sku: str, stale_ratio: float = 0.5):
+        # a fresh response per call, built in memory, so concurrent calls never share state
+        self.response = models.VendorAResponse(
+            product_id=sku, # set sku
+            # set product name
+            product_name=HelperFuncs.gen_rand_string(
+                random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
+                Constants.CHARSET
+            ),
+            price=0,
+            inventory=None,
+            product_in_stock=False,
+            last_updated=0
         )
+        respA = self.response
+
         # set product description
         switch_on = random.randint(0, 1) # randomly select between a randomly generated description or None
         if switch_on: # then set a description
-            self.respA.product_description = HelperFuncs.gen_rand_string(
+            respA.product_description = HelperFuncs.gen_rand_string(
             random.randint(Constants.PRODUCT_DESCRIPTION_MIN, Constants.PRODUCT_DESCRIPTION_MAX),
             Constants.CHARSET
         )
         else: # else None
-            self.respA.product_description = None
+            respA.product_description = None
         
         # set price to a randomly generated float
-        self.respA.price = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
+        respA.price = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
 
         # set inventory & stock_status
         switch_on = random.randint(0, 1)
         if switch_on: # then stock = 5
-            self.respA.inventory = 0 if random.randint(0, 1) else None
-            self.respA.product_in_stock = True
+            respA.inventory = 0 if random.randint(0, 1) else None
+            respA.product_in_stock = True
         else:
             switch_on = random.randint(0, 1)
             if switch_on: # in_stock = True
-                self.respA.product_in_stock = True
-                self.respA.inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
+                respA.product_in_stock = True
+                respA.inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
             else: 
-                self.respA.product_in_stock = False
-                self.respA.inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
+                respA.product_in_stock = False
+                respA.inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
         
         # set timestamp
-        self.respA.last_updated = HelperFuncs.set_timestamp_in_millis()
-
-        '''
-        [TODO] If time allows: 
-        POST call https://api.mocki.io/public/mocks with this payload and other headers
-        and receive "slug" and "url" and set VendorURL = url
-        '''
-
-        # write to file
-        with open(self.mock_file_path, "w") as mock_file:
-            mock_file.write(encode(self.respA))
-        mock_file.close()
+        respA.last_updated = HelperFuncs.set_timestamp_in_millis(stale_ratio)
 
 # simulator for vendorB
 class SimulatorB: 
-    # declare respB with filler values to have a valid definition
-    respB: models.VendorBResponse = models.VendorBResponse(
-        id="",
-        product_metadata=models.VendorBMetadata(
-            title="",
-            description="",
-            image_details=""
-        ),
-        cost=0,
-        inventory=models.VendorBInventory(
-            product_inventory=0,
-            stock_status=models.VendorBStockStatus.out_of_stock
-        ),
-        last_refresh_time=0
-    )
-    # file path for external access
-    mock_file_path: str = "./simulated_responses/vendorB_resp.json"
-
-    def __init__(self, sku: str):
-        # set sku
-        self.respB.id = sku
-        # set product name
-        self.respB.product_metadata.title = HelperFuncs.gen_rand_string(
-            random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
-            Constants.CHARSET
+    def __init__(self, sku: str, stale_ratio: float = 0.5):
+        # a fresh response per call, built in memory, so concurrent calls never share state
+        self.response = models.VendorBResponse(
+            id=sku, # set sku
+            product_metadata=models.VendorBMetadata(
+                # set product name
+                title=HelperFuncs.gen_rand_string(
+                    random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
+                    Constants.CHARSET
+                ),
+                description="",
+                image_details="" # set image details as empty for now
+            ),
+            cost=0,
+            inventory=models.VendorBInventory(
+                product_inventory=0,
+                stock_status=models.VendorBStockStatus.out_of_stock
+            ),
+            last_refresh_time=0
         )
+        respB = self.response
+
         # set product description
         switch_on = random.randint(0, 1) # randomly select between a randomly generated description or empty string
         if switch_on: # then set a description
-            self.respB.product_metadata.description = HelperFuncs.gen_rand_string(
+            respB.product_metadata.description = HelperFuncs.gen_rand_string(
             random.randint(Constants.PRODUCT_DESCRIPTION_MIN, Constants.PRODUCT_DESCRIPTION_MAX),
             Constants.CHARSET
         )
-        else: # else None
-            self.respB.product_metadata.description = ""
-        
-        # set image details as empty for now
-        self.respB.product_metadata.image_details = ""
         
         # set price to a randomly generated float
-        self.respB.cost = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
+        respB.cost = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
 
         # set inventory & stock_status
         switch_on = random.randint(0, 1)
         if switch_on: # then stock = 5
-            self.respB.inventory.product_inventory = 0
-            self.respB.inventory.stock_status = models.VendorBStockStatus.in_stock
+            respB.inventory.product_inventory = 0
+            respB.inventory.stock_status = models.VendorBStockStatus.in_stock
         else:
             switch_on = random.randint(0, 1)
             if switch_on: # in_stock = True
-                self.respB.inventory.stock_status = models.VendorBStockStatus.in_stock
-                self.respB.inventory.product_inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
+                respB.inventory.stock_status = models.VendorBStockStatus.in_stock
+                respB.inventory.product_inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
             else: 
-                self.respB.inventory.stock_status = models.VendorBStockStatus.out_of_stock
-                self.respB.inventory.product_inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
+                respB.inventory.stock_status = models.VendorBStockStatus.out_of_stock
+                respB.inventory.product_inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
         
         # set timestamp
-        self.respB.last_refresh_time = HelperFuncs.set_timestamp_in_millis()
-
-        '''
-        [TODO] If time allows: 
-        POST call https://api.mocki.io/public/mocks with this payload and other headers
-        and receive "slug" and "url" and set VendorURL = url
-        '''
-
-        # write to file
-        with open(self.mock_file_path, "w") as mock_file:
-            mock_file.write(encode(self.respB))
-        mock_file.close()
+        respB.last_refresh_time = HelperFuncs.set_timestamp_in_millis(stale_ratio)
 
+# simulator for vendorC
 class SimulatorC: 
-    # declare respC with filler values to have a valid definition
-    respC: models.VendorCResponse = models.VendorCResponse(
-        sku_id="",
-        details=models.VendorCDetails(
-            name="",
-            desc="",
-            product_price=0,
-            p_inventory=0,
-            p_stock=models.VendorCStockStatus.out_of_stock
-        ),
-        details_updated_at=0
-    )
-    # file path for external access
-    mock_file_path: str = "./simulated_responses/vendorC_resp.json"
-
-    def __init__(self, sku: str):
-        # decide which case
-        self.case_for_vendorC = HelperFuncs.gen_case_for_vendorC()
-
-        # if it fails, then no need to write to file so return
-        if self.case_for_vendorC == models.CaseForVendorC.fail: return 
-            
-        # set sku
-        self.respC.sku_id = sku
-        # set product name
-        self.respC.details.name = HelperFuncs.gen_rand_string(
-            random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
-            Constants.CHARSET
+    def __init__(self, sku: str, stale_ratio: float = 0.5):
+        # a fresh response per call, built in memory, so concurrent calls never share state
+        self.response = models.VendorCResponse(
+            sku_id=sku, # set sku
+            details=models.VendorCDetails(
+                # set product name
+                name=HelperFuncs.gen_rand_string(
+                    random.randint(Constants.PRODUCT_NAME_MIN, Constants.PRODUCT_NAME_MAX),
+                    Constants.CHARSET
+                ),
+                desc="",
+                product_price=0,
+                p_inventory=0,
+                p_stock=models.VendorCStockStatus.out_of_stock
+            ),
+            details_updated_at=0
         )
+        respC = self.response
+
         # set product description
         switch_on = random.randint(0, 1) # randomly select between a randomly generated description or empty string
         if switch_on: # then set a description
-            self.respC.details.desc = HelperFuncs.gen_rand_string(
+            respC.details.desc = HelperFuncs.gen_rand_string(
             random.randint(Constants.PRODUCT_DESCRIPTION_MIN, Constants.PRODUCT_DESCRIPTION_MAX),
             Constants.CHARSET
         )
-        else: # else None
-            self.respC.details.desc = ""
         
         # set price to a randomly generated float
-        self.respC.details.product_price = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
+        respC.details.product_price = random.uniform(Constants.MIN_PRICE, Constants.MAX_PRICE)
 
         # set inventory & stock_status
         switch_on = random.randint(0, 1)
         if switch_on: # then stock = 5
-            self.respC.details.p_inventory = 0
-            self.respC.details.p_stock = models.VendorCStockStatus.in_stock
+            respC.details.p_inventory = 0
+            respC.details.p_stock = models.VendorCStockStatus.in_stock
         else:
             switch_on = random.randint(0, 1)
             if switch_on: # in_stock = True
-                self.respC.details.p_stock = models.VendorCStockStatus.in_stock
-                self.respC.details.p_inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
+                respC.details.p_stock = models.VendorCStockStatus.in_stock
+                respC.details.p_inventory = random.randint(1, Constants.MAX_STOCK) # cannot be 0 to avoid above case
             else: 
-                self.respC.details.p_stock = models.VendorCStockStatus.out_of_stock
-                self.respC.details.p_inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
+                respC.details.p_stock = models.VendorCStockStatus.out_of_stock
+                respC.details.p_inventory = random.randint(0, Constants.MAX_STOCK) # can be 0
 
         # set timestamp
-        self.respC.details_updated_at = HelperFuncs.set_timestamp_in_millis()
-
-        '''
-        [TODO] If time allows: 
-        POST call https://api.mocki.io/public/mocks with this payload and other headers
-        and receive "slug" and "url" and set VendorURL = url
-        '''
-
-        # write to file
-        with open(self.mock_file_path, "w") as mock_file:
-            mock_file.write(encode(self.respC))
-        mock_file.close()
\ No newline at end of file
+        respC.details_updated_at = HelperFuncs.set_timestamp_in_millis(stale_ratio)
@@ -0,0 +1,49 @@
+# project-file imports
+import app.core.constants as constants
+from app.switch import switch
+from simulation.simulators import SimulatorA, SimulatorB, SimulatorC
+
+# library imports
+import random
+from asyncio import sleep
+from typing import NamedTuple
+from httpx import MockTransport, Request, Response
+
+# how a simulated vendor behaves
+class SimulatedVendorProfile(NamedTuple):
+    latency_in_millis: tuple[float, float] # (min, max), drawn uniformly per call
+    error_rate: float # share of calls answered with a 503
+    stale_ratio: float # share of responses whose timestamp is older than FRESHNESS_LIMIT
+
+def fetch_profile_per_vendor() -> dict[str, SimulatedVendorProfile]:
+    params = switch.SimulationParams
+    return {
+        constants.Constants.VENDORA_NAME: SimulatedVendorProfile(params.VENDORA_LATENCY_IN_MILLIS, params.VENDORA_ERROR_RATE, params.VENDORA_STALE_RATIO),
+        constants.Constants.VENDORB_NAME: SimulatedVendorProfile(params.VENDORB_LATENCY_IN_MILLIS, params.VENDORB_ERROR_RATE, params.VENDORB_STALE_RATIO),
+        constants.Constants.VENDORC_NAME: SimulatedVendorProfile(params.VENDORC_LATENCY_IN_MILLIS, params.VENDORC_ERROR_RATE, params.VENDORC_STALE_RATIO),
+    }
+
+SIMULATOR_PER_VENDOR = {
+    constants.Constants.VENDORA_NAME: SimulatorA,
+    constants.Constants.VENDORB_NAME: SimulatorB,
+    constants.Constants.VENDORC_NAME: SimulatorC,
+}
+
+def build_simulated_transport(vendor_name: str, profile: SimulatedVendorProfile) -> MockTransport:
+    simulator = SIMULATOR_PER_VENDOR[vendor_name]
+
+    # plugged into the vendor's AsyncClient, so the real request path (rate limit, retries, decoding) still runs
+    async def handle(request: Request) -> Response:
+        await sleep(random.uniform(*profile.latency_in_millis) / 1000)
+
+        if random.random() < profile.error_rate:
+            return Response(503, json={"error": f"{vendor_name} is unavailable"})
+
+        sku = request.url.params.get("sku", "")
+        return Response(
+            200,
+            content=simulator(sku, profile.stale_ratio).response.model_dump_json(),
+            headers={"content-type": "application/json"}
+        )
+
+    return MockTransport(handle)
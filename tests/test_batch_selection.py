@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from app.core.constants import Constants
+from app.services.batch_selection import build_price_stock_matrices, select_best_vendors
+from app.services.sku_service import NormalizedParams, SKUServiceHelper
+from app.switch.switch import SwitchValues
+
+# prices clustered around the 10% boundary of the rule upgrade (100 * 1.1 = 110), plus ties and random ones
+BOUNDARY_PRICES = [0.0, 100.0, 100.0, 109.99999, 110.0, 110.00001, 121.0]
+STOCKS = [0, 0, 5, 5, 10]
+
+def random_rows(rng: random.Random, n_vendors: int, n_skus: int) -> list[list[NormalizedParams]]:
+    return [
+        [
+            NormalizedParams(
+                stock=rng.choice(STOCKS + [rng.randint(0, 50)]),
+                price=rng.choice(BOUNDARY_PRICES + [round(rng.uniform(1, 300), 2)]),
+                vendor_name=f"vendor{idx}"
+            )
+            for idx in range(n_vendors)
+        ]
+        for _ in range(n_skus)
+    ]
+
+def scalar_best_vendors(rows: list[list[NormalizedParams]], is_rule_upgrade_enabled: bool) -> list[str]:
+    previous = SwitchValues.IS_PRICE_STOCK_RULE_UPGRADE_ENABLED
+    SwitchValues.IS_PRICE_STOCK_RULE_UPGRADE_ENABLED = is_rule_upgrade_enabled
+    try:
+        return [SKUServiceHelper.get_best_vendor_from_normalized_tuple_list(list(row)) for row in rows]
+    finally:
+        SwitchValues.IS_PRICE_STOCK_RULE_UPGRADE_ENABLED = previous
+
+@pytest.mark.parametrize("is_rule_upgrade_enabled", [False, True])
+@pytest.mark.parametrize("n_vendors", [1, 2, 3, 4, 5, 6])
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_scalar_selection_on_random_offers(seed: int, n_vendors: int, is_rule_upgrade_enabled: bool):
+    rows = random_rows(random.Random(seed * 100 + n_vendors), n_vendors, n_skus=50)
+    prices, stocks, vendor_names = build_price_stock_matrices(rows)
+    assert select_best_vendors(prices, stocks, vendor_names, is_rule_upgrade_enabled) == \
+        scalar_best_vendors(rows, is_rule_upgrade_enabled)
+
+@pytest.mark.parametrize("is_rule_upgrade_enabled", [False, True])
+@pytest.mark.parametrize("row, expected", [
+    # all out of stock
+    ([(0, 10.0, "vendorA"), (0, 5.0, "vendorB")], Constants.BEST_VENDOR_SELECTION_OOS_MESSAGE),
+    # the cheaper one is out of stock
+    ([(0, 5.0, "vendorA"), (3, 10.0, "vendorB")], "vendorB"),
+    # same price and stock, the first one in the list wins
+    ([(5, 10.0, "vendorA"), (5, 10.0, "vendorB"), (5, 10.0, "vendorC")], "vendorA"),
+    # same price, the bigger stock wins
+    ([(5, 10.0, "vendorA"), (8, 10.0, "vendorB")], "vendorB"),
+])
+def test_edge_cases(row, expected, is_rule_upgrade_enabled: bool):
+    rows = [[NormalizedParams(*params) for params in row]]
+    prices, stocks, vendor_names = build_price_stock_matrices(rows)
+    assert select_best_vendors(prices, stocks, vendor_names, is_rule_upgrade_enabled) == [expected]
+    assert scalar_best_vendors(rows, is_rule_upgrade_enabled) == [expected]
+
+@pytest.mark.parametrize("expensive_price, expected", [
+    (110.0, "vendorA"), # exactly 10% more: not beyond the boundary, the cheaper one stays
+    (110.01, "vendorB") # just beyond it: the one with more stock takes over
+])
+def test_price_diff_boundary_of_rule_upgrade(expensive_price: float, expected: str):
+    rows = [[NormalizedParams(5, 100.0, "vendorA"), NormalizedParams(10, expensive_price, "vendorB")]]
+    prices, stocks, vendor_names = build_price_stock_matrices(rows)
+    assert select_best_vendors(prices, stocks, vendor_names, is_rule_upgrade_enabled=True) == [expected]
+    assert scalar_best_vendors(rows, is_rule_upgrade_enabled=True) == [expected]